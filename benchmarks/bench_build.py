@@ -0,0 +1,305 @@
+# OpenAWE - A reimplementation of Remedy's Alan Wake Engine
+#
+# OpenAWE is the legal property of its developers, whose names
+# can be found in the AUTHORS file distributed with this source
+# distribution.
+#
+# OpenAWE is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# OpenAWE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OpenAWE. If not, see <http://www.gnu.org/licenses/>.
+
+# Runs the build stages of the import operators against synthetic meshes on top of fake_bpy and reports the number
+# of RNA calls and the wall time per stage. With --check, the call counts are compared against a budget file and the
+# script fails if any stage got more expensive, if welding does not lower the vertex count or if reimporting a file
+# with one changed submesh updates anything else.
+#
+#   python benchmarks/bench_build.py [--check benchmarks/call_budget.json]
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import struct
+import argparse
+import tempfile
+import contextlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_bpy
+
+bpy = fake_bpy.install()
+
+from io_mesh_northlight import util
+from io_mesh_northlight import binmsh_loader
+from io_mesh_northlight import northlight_binmsh_import
+from io_mesh_northlight import northlight_binfol_import
+from io_mesh_northlight import operators
+from io_mesh_northlight.binmsh_loader import Material, Mesh
+from io_mesh_northlight.binmsh_writer import write_binmsh
+
+
+STAGES = ["parse", "set_geometry", "add_uv_layers", "add_vertex_colors", "add_bone_data", "add_material"]
+
+stats = {}
+
+
+def measure(stage, function):
+    def wrapper(*args, **kwargs):
+        calls_before = sum(fake_bpy.calls.values())
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stats[stage][0] += sum(fake_bpy.calls.values()) - calls_before
+            stats[stage][1] += time.perf_counter() - start
+
+    return wrapper
+
+
+def instrument():
+    for stage in STAGES[1:]:
+        setattr(util, stage, measure(stage, getattr(util, stage)))
+
+    parse = measure("parse", binmsh_loader.BINMSH)
+    for module in (binmsh_loader, northlight_binmsh_import, northlight_binfol_import):
+        module.BINMSH = parse
+
+
+def create_submesh(rng, grid_size, lod, bone_count):
+    # A grid split into two halves at its middle column, like a mesh split at an uv seam
+    x, y = np.meshgrid(np.arange(grid_size), np.arange(grid_size), indexing="ij")
+    seam = grid_size // 2
+    positions = np.column_stack((x.ravel(), y.ravel(), np.zeros(grid_size * grid_size))) / grid_size
+    positions = np.concatenate((positions, positions[seam * grid_size:(seam + 1) * grid_size]))
+
+    quads = np.array([(i * grid_size + j, (i + 1) * grid_size + j) for i in range(grid_size - 1)
+                      for j in range(grid_size - 1)])
+    faces = np.concatenate((
+        np.column_stack((quads[:, 0], quads[:, 1], quads[:, 0] + 1)),
+        np.column_stack((quads[:, 0] + 1, quads[:, 1], quads[:, 1] + 1)),
+    ))
+    # Triangles on the right of the seam use the duplicated column
+    duplicates = (faces >= seam * grid_size) & (faces < (seam + 1) * grid_size)
+    right = np.all(faces >= seam * grid_size, axis=1)[:, np.newaxis]
+    faces = np.where(duplicates & right, faces - seam * grid_size + grid_size * grid_size, faces)
+
+    vertex_count = len(positions)
+    uv = positions[:, :2]
+    colors = rng.integers(0, 256, (vertex_count, 4)) / 255.0
+    bone_ids = rng.integers(0, 16, (vertex_count, 4))
+    bone_weights = rng.integers(0, 32, (vertex_count, 4)) * 8 / 255.0
+
+    material = Material(
+        "standardmaterial",
+        "material.lod{}".format(lod),
+        0x40000000 | 0x4,
+        {
+            "g_sColorMap": "textures/color.dds",
+            "g_vColorMultiplier": (1.0, 1.0, 1.0, 1.0),
+            "g_sSpecularMap": "textures/specular.dds",
+            "g_vSpecularMultiplier": (0.5, 0.5, 0.5),
+            "g_fGlossiness": (0.25,),
+        }
+    )
+
+    return Mesh(
+        lod,
+        positions,
+        faces,
+        bone_ids,
+        bone_weights,
+        tuple(range(lod, lod + 16)),
+        [uv, uv[::-1]],
+        [colors],
+        material
+    )
+
+
+def write_files(directory, submesh_count, grid_size):
+    rng = np.random.default_rng(0)
+    bone_names = ["bone{}".format(i) for i in range(64)]
+    meshs = [create_submesh(rng, grid_size, i % 4, len(bone_names)) for i in range(submesh_count)]
+
+    binmsh_path = os.path.join(directory, "synthetic.binmsh")
+    with open(binmsh_path, "wb") as f:
+        write_binmsh(f, 20, bone_names, meshs)
+
+    # The same file with the geometry of its first submesh moved
+    meshs[0].positions = meshs[0].positions + 1.0
+    changed_path = os.path.join(directory, "synthetic_changed.binmsh")
+    with open(changed_path, "wb") as f:
+        write_binmsh(f, 20, bone_names, meshs)
+    meshs[0].positions = meshs[0].positions - 1.0
+
+    mesh_data = io.BytesIO()
+    write_binmsh(mesh_data, 19, bone_names, meshs)
+    binfol_path = os.path.join(directory, "synthetic.binfol")
+    with open(binfol_path, "wb") as f:
+        f.write(struct.pack("II", 19, len(mesh_data.getvalue())))
+        f.write(mesh_data.getvalue())
+
+    return binmsh_path, changed_path, binfol_path
+
+
+def run_operator(operator_class, filepath=None, **properties):
+    operator = operator_class()
+    if filepath is not None:
+        operator.filepath = filepath
+    for name, value in properties.items():
+        setattr(operator, name, value)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        operator.execute(bpy.context)
+
+    return operator
+
+
+def run_case(name, steps):
+    fake_bpy.reset()
+    util.mesh_registry.clear()
+
+    # Every step but the last only prepares the scene
+    for step in steps[:-1]:
+        step()
+
+    for stage in STAGES:
+        stats[stage] = [0, 0.0]
+    fake_bpy.calls.clear()
+
+    start = time.perf_counter()
+    operator = steps[-1]()
+    seconds = time.perf_counter() - start
+
+    return {
+        "total": [sum(fake_bpy.calls.values()), seconds],
+        "stages": {stage: list(value) for stage, value in stats.items()},
+        "calls": dict(fake_bpy.calls),
+        "vertices": sum(len(mesh.vertices) for mesh in bpy.data.meshes),
+        "reports": [message for _, message in operator.reports],
+    }
+
+
+def print_case(name, result, verbose):
+    print(name)
+    for stage, (calls, seconds) in result["stages"].items():
+        print("  {:<20} {:>10} calls {:>10.1f} ms".format(stage, calls, seconds * 1000.0))
+    calls, seconds = result["total"]
+    print("  {:<20} {:>10} calls {:>10.1f} ms".format("total", calls, seconds * 1000.0))
+    print("  {:<20} {:>10}".format("vertices", result["vertices"]))
+    for report in result["reports"]:
+        print("  {}".format(report))
+
+    if verbose:
+        for call, count in sorted(result["calls"].items(), key=lambda item: -item[1]):
+            print("    {:<40} {:>10}".format(call, count))
+
+
+def check_budget(results, budget):
+    failed = False
+    for name, result in results.items():
+        expected = budget.get(name)
+        if expected is None:
+            continue
+
+        for stage, limit in expected.items():
+            calls = result["total"][0] if stage == "total" else result["stages"][stage][0]
+            if calls > limit:
+                print("{}: {} makes {} RNA calls, budget is {}".format(name, stage, calls, limit))
+                failed = True
+
+    return not failed
+
+
+def check_results(results, submesh_count):
+    failed = False
+
+    welded = results["binmsh import welded"]["vertices"]
+    unwelded = results["binmsh import"]["vertices"]
+    if welded >= unwelded:
+        print("binmsh import welded: {} vertices, welding did not lower the {} vertices".format(welded, unwelded))
+        failed = True
+
+    expected = "Updated 1 of {} submeshs".format(submesh_count)
+    reports = results["binmsh reimport changed"]["reports"]
+    if expected not in reports:
+        print("binmsh reimport changed: reported {}, expected {}".format(reports, expected))
+        failed = True
+
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Blender build stage of the Northlight importers")
+    parser.add_argument("--submeshs", type=int, default=8)
+    parser.add_argument("--grid", type=int, default=128, help="Grid size of every synthetic submesh")
+    parser.add_argument("--check", metavar="BUDGET", help="Fail if a stage exceeds the call counts in this file")
+    parser.add_argument("--write-budget", metavar="BUDGET", help="Write the current call counts as budget")
+    parser.add_argument("--verbose", action="store_true", help="Print the count of every RNA call")
+    args = parser.parse_args()
+
+    instrument()
+
+    with tempfile.TemporaryDirectory() as directory:
+        binmsh_path, changed_path, binfol_path = write_files(directory, args.submeshs, args.grid)
+        reimport_path = os.path.join(directory, "reimport.binmsh")
+
+        def import_binmsh(**properties):
+            return lambda: run_operator(operators.NorthlightImport, binmsh_path, **properties)
+
+        cases = {
+            "binmsh import": [import_binmsh(reuse_meshes=False)],
+            "binmsh import reusing meshes": [import_binmsh(), import_binmsh()],
+            "binmsh import welded": [import_binmsh(reuse_meshes=False, weld_vertices=True)],
+            "binfol import": [
+                lambda: run_operator(operators.NorthlightFoliageImport, binfol_path, reuse_meshes=False)
+            ],
+            "binmsh reimport unchanged": [
+                import_binmsh(),
+                lambda: run_operator(operators.NorthlightReimport, binmsh_path)
+            ],
+            "binmsh reimport changed": [
+                lambda: shutil.copyfile(binmsh_path, reimport_path),
+                lambda: run_operator(operators.NorthlightImport, reimport_path),
+                lambda: shutil.copyfile(changed_path, reimport_path),
+                lambda: run_operator(operators.NorthlightReimport, reimport_path)
+            ],
+            "set lod": [import_binmsh(), lambda: run_operator(operators.NorthlightSetLOD, lod=1)],
+        }
+
+        results = {}
+        for name, steps in cases.items():
+            results[name] = run_case(name, steps)
+            print_case(name, results[name], args.verbose)
+
+    if args.write_budget:
+        budget = {
+            name: dict({"total": result["total"][0]}, **{s: v[0] for s, v in result["stages"].items()})
+            for name, result in results.items()
+        }
+        with open(args.write_budget, "w") as f:
+            json.dump(budget, f, indent=4)
+            f.write("\n")
+
+    if args.check:
+        with open(args.check) as f:
+            within_budget = check_budget(results, json.load(f))
+        if not check_results(results, args.submeshs) or not within_budget:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# OpenAWE - A reimplementation of Remedy's Alan Wake Engine
+#
+# OpenAWE is the legal property of its developers, whose names
+# can be found in the AUTHORS file distributed with this source
+# distribution.
+#
+# OpenAWE is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# OpenAWE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OpenAWE. If not, see <http://www.gnu.org/licenses/>.
+
+# Measures what enabling the add-on costs: importing the package and calling register(). Every measurement runs in a
+# fresh interpreter on top of fake_bpy, since modules are only imported once per process. Inside of Blender, a single
+# measurement is taken with the real bpy:
+#
+#   python benchmarks/bench_startup.py [--repeat N] [--check]
+#   blender -b --factory-startup --python benchmarks/bench_startup.py -- [--check]
+#
+# With --check, the script fails if registering imported any of the modules only needed when an operator runs.
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PACKAGE = "io_mesh_northlight"
+LAZY_MODULES = [
+    "numpy",
+    PACKAGE + ".binmsh_loader",
+    PACKAGE + ".util",
+    PACKAGE + ".material",
+    PACKAGE + ".northlight_binmsh_import",
+    PACKAGE + ".northlight_binfol_import",
+    PACKAGE + ".northlight_binmsh_export",
+]
+
+
+def in_blender():
+    try:
+        import bpy
+    except ImportError:
+        return False
+    return hasattr(bpy, "app")
+
+
+def measure():
+    before = set(sys.modules)
+    start = time.perf_counter()
+
+    import io_mesh_northlight
+    io_mesh_northlight.register()
+
+    seconds = time.perf_counter() - start
+    modules = sorted(set(sys.modules) - before)
+
+    io_mesh_northlight.unregister()
+
+    return {"seconds": seconds, "modules": modules}
+
+
+def main():
+    if "--" in sys.argv:
+        argv = sys.argv[sys.argv.index("--") + 1:]
+    else:
+        argv = [] if in_blender() else sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description="Measure the startup cost of the Northlight add-on")
+    parser.add_argument("--repeat", type=int, default=10, help="Number of fresh interpreters to measure in")
+    parser.add_argument("--check", action="store_true", help="Fail if registering imported a lazy module")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        import fake_bpy
+        fake_bpy.install()
+        print(json.dumps(measure()))
+        return
+
+    if in_blender():
+        results = [measure()]
+    else:
+        results = []
+        for _ in range(args.repeat):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child"],
+                check=True,
+                capture_output=True,
+                text=True
+            ).stdout
+            results.append(json.loads(output.splitlines()[-1]))
+
+    times = [result["seconds"] * 1000.0 for result in results]
+    modules = results[0]["modules"]
+    print("Import and register: min {:.2f} ms, median {:.2f} ms over {} runs".format(
+        min(times),
+        statistics.median(times),
+        len(times)
+    ))
+    print("Imported modules: {}".format(", ".join(m for m in modules if m.startswith(PACKAGE))))
+
+    loaded = [m for m in LAZY_MODULES if m in modules]
+    if loaded:
+        print("Imported on registration although only needed by operators: {}".format(", ".join(loaded)))
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,652 @@
+# OpenAWE - A reimplementation of Remedy's Alan Wake Engine
+#
+# OpenAWE is the legal property of its developers, whose names
+# can be found in the AUTHORS file distributed with this source
+# distribution.
+#
+# OpenAWE is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# OpenAWE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OpenAWE. If not, see <http://www.gnu.org/licenses/>.
+
+# Minimal stand-in for the bpy module, recording every call and property write that would cross into RNA. It only
+# implements the parts of the API used by the add-on.
+
+import sys
+import types
+import collections
+
+
+calls = collections.Counter()
+
+
+def record(name):
+    calls[name] += 1
+
+
+class Struct:
+    # Property writes are counted, attributes starting with an underscore are internal to the fake
+    def __setattr__(self, name, value):
+        if not name.startswith("_"):
+            record("{}.{}".format(type(self).__name__, name))
+        object.__setattr__(self, name, value)
+
+
+class ID(Struct):
+    def __init__(self, name):
+        self._properties = {}
+        self._collection = None
+        object.__setattr__(self, "name", name)
+
+    def __setattr__(self, name, value):
+        # Renaming keeps the blend data collection keyed by name and unique like Blender does
+        if name == "name" and self._collection is not None and value != self.name:
+            items = self._collection._items
+            del items[self.name]
+            value = unique_name(value, items)
+            items[value] = self
+        super().__setattr__(name, value)
+
+    def __getitem__(self, key):
+        record("{}.__getitem__".format(type(self).__name__))
+        return self._properties[key]
+
+    def __setitem__(self, key, value):
+        record("{}.__setitem__".format(type(self).__name__))
+        self._properties[key] = list(value) if isinstance(value, (list, tuple)) else value
+
+    def __delitem__(self, key):
+        record("{}.__delitem__".format(type(self).__name__))
+        del self._properties[key]
+
+    def __contains__(self, key):
+        record("{}.__contains__".format(type(self).__name__))
+        return key in self._properties
+
+    def get(self, key, default=None):
+        record("{}.get".format(type(self).__name__))
+        return self._properties.get(key, default)
+
+
+class ArrayCollection:
+    # Element collection keeping its attributes as arrays, only accessible in bulk
+    def __init__(self, owner, length=0):
+        self._owner = owner
+        self._length = length
+        self._arrays = {}
+
+    def __len__(self):
+        return self._length
+
+    def add(self, count):
+        record("{}.add".format(self._owner))
+        self._length += count
+
+    def foreach_set(self, attribute, seq):
+        # Imported here, so that measuring the add-on startup can tell whether it imported NumPy itself
+        import numpy as np
+
+        record("{}.foreach_set".format(self._owner))
+        data = np.array(seq)
+        if len(data) % max(self._length, 1) != 0 or (self._length == 0 and len(data) != 0):
+            raise ValueError("foreach_set size mismatch for {}.{}".format(self._owner, attribute))
+        self._arrays[attribute] = data
+
+    def foreach_get(self, attribute, seq):
+        record("{}.foreach_get".format(self._owner))
+        seq[:] = self._arrays[attribute].reshape(-1)
+
+    def clear(self):
+        self._length = 0
+        self._arrays = {}
+
+
+class Layer(Struct):
+    def __init__(self, owner, name, length):
+        object.__setattr__(self, "name", name)
+        self.__dict__["data"] = ArrayCollection(owner + "Data", length)
+
+
+class MeshLayers:
+    def __init__(self, owner, mesh, prefix):
+        self._owner = owner
+        self._mesh = mesh
+        self._prefix = prefix
+        self._layers = []
+
+    def __len__(self):
+        return len(self._layers)
+
+    def __iter__(self):
+        return iter(self._layers)
+
+    def __getitem__(self, index):
+        return self._layers[index]
+
+    def new(self, name=""):
+        record("{}.new".format(self._owner))
+        layer = Layer(self._owner[:-1], name or "{}{}".format(self._prefix, len(self._layers)), len(self._mesh.loops))
+        self._layers.append(layer)
+        return layer
+
+    def remove(self, layer):
+        record("{}.remove".format(self._owner))
+        self._layers.remove(layer)
+
+
+class IDMaterials(list):
+    def append(self, material):
+        record("IDMaterials.append")
+        super().append(material)
+
+    def clear(self):
+        record("IDMaterials.clear")
+        super().clear()
+
+
+class Mesh(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__.update(
+            vertices=ArrayCollection("MeshVertices"),
+            loops=ArrayCollection("MeshLoops"),
+            polygons=ArrayCollection("MeshPolygons"),
+            edges=ArrayCollection("MeshEdges"),
+            materials=IDMaterials(),
+        )
+        self.__dict__["uv_layers"] = MeshLayers("UVLoopLayers", self, "UVMap")
+        self.__dict__["vertex_colors"] = MeshLayers("LoopColors", self, "Col")
+
+    @property
+    def users(self):
+        return sum(1 for obj in data.objects if obj.data is self)
+
+    def from_pydata(self, vertices, edges, faces):
+        record("Mesh.from_pydata")
+        self.vertices._length = len(vertices)
+        self.loops._length = sum(len(face) for face in faces)
+        self.polygons._length = len(faces)
+
+    def update(self, calc_edges=False):
+        record("Mesh.update")
+
+    def clear_geometry(self):
+        record("Mesh.clear_geometry")
+        for elements in (self.vertices, self.loops, self.polygons, self.edges):
+            elements.clear()
+        self.uv_layers._layers.clear()
+        self.vertex_colors._layers.clear()
+
+    def copy(self):
+        record("Mesh.copy")
+        mesh = data.meshes.new(self.name)
+        for attribute in ("vertices", "loops", "polygons", "edges"):
+            elements = getattr(mesh, attribute)
+            elements._length = len(getattr(self, attribute))
+            elements._arrays = dict(getattr(self, attribute)._arrays)
+        mesh.uv_layers._layers.extend(self.uv_layers)
+        mesh.vertex_colors._layers.extend(self.vertex_colors)
+        mesh.materials.extend(self.materials)
+        mesh._properties = dict(self._properties)
+        return mesh
+
+
+class VertexGroup(Struct):
+    def __init__(self, name, index):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "index", index)
+        self._weights = {}
+
+    def add(self, index, weight, type):
+        record("VertexGroup.add")
+        for vertex_index in index:
+            self._weights[vertex_index] = weight
+
+
+class VertexGroups:
+    def __init__(self):
+        self._groups = []
+
+    def __len__(self):
+        return len(self._groups)
+
+    def __iter__(self):
+        return iter(self._groups)
+
+    def __getitem__(self, key):
+        record("VertexGroups.__getitem__")
+        if isinstance(key, str):
+            for group in self._groups:
+                if group.name == key:
+                    return group
+            raise KeyError(key)
+        return self._groups[key]
+
+    def new(self, name="Group"):
+        record("VertexGroups.new")
+        group = VertexGroup(unique_name(name, {g.name for g in self._groups}), len(self._groups))
+        self._groups.append(group)
+        return group
+
+    def clear(self):
+        record("VertexGroups.clear")
+        self._groups.clear()
+
+
+class Modifier(Struct):
+    def __init__(self, name, type):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "type", type)
+
+
+class Modifiers:
+    def __init__(self):
+        self._modifiers = []
+
+    def __iter__(self):
+        return iter(self._modifiers)
+
+    def new(self, name, type):
+        record("ObjectModifiers.new")
+        modifier = Modifier(name, type)
+        self._modifiers.append(modifier)
+        return modifier
+
+    def get(self, name, default=None):
+        record("ObjectModifiers.get")
+        return next((m for m in self._modifiers if m.name == name), default)
+
+    def remove(self, modifier):
+        record("ObjectModifiers.remove")
+        self._modifiers.remove(modifier)
+
+
+class Object(ID):
+    def __init__(self, name, object_data):
+        super().__init__(name)
+        self.__dict__.update(
+            data=object_data,
+            type="MESH" if isinstance(object_data, Mesh) else "EMPTY",
+            vertex_groups=VertexGroups(),
+            modifiers=Modifiers(),
+        )
+
+    @property
+    def users_collection(self):
+        collections = [context.scene.collection, *data.collections]
+        return [collection for collection in collections if self in collection.objects._objects]
+
+
+class Socket(Struct):
+    def __init__(self, name):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "default_value", None)
+
+
+class Sockets:
+    def __init__(self, owner):
+        self._owner = owner
+        self._sockets = {}
+
+    def __getitem__(self, key):
+        record("{}.__getitem__".format(self._owner))
+        return self._sockets.setdefault(key, Socket(str(key)))
+
+
+class Node(Struct):
+    def __init__(self, name, type):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "type", type)
+        object.__setattr__(self, "label", "")
+        object.__setattr__(self, "image", None)
+        self.__dict__["inputs"] = Sockets("NodeInputs")
+        self.__dict__["outputs"] = Sockets("NodeOutputs")
+
+
+class Nodes:
+    def __init__(self):
+        self._nodes = {}
+
+    def __iter__(self):
+        return iter(self._nodes.values())
+
+    def __getitem__(self, name):
+        record("Nodes.__getitem__")
+        return self._nodes[name]
+
+    def new(self, type):
+        record("Nodes.new")
+        node = Node(unique_name(type, self._nodes), type)
+        self._nodes[node.name] = node
+        return node
+
+
+class Links:
+    def __init__(self):
+        self._links = []
+
+    def new(self, output, input):
+        record("NodeLinks.new")
+        self._links.append((output, input))
+
+
+class NodeTree(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["nodes"] = Nodes()
+        self.__dict__["links"] = Links()
+        self.nodes._nodes["Principled BSDF"] = Node("Principled BSDF", "BSDF_PRINCIPLED")
+
+
+class Material(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        object.__setattr__(self, "use_nodes", False)
+        self.__dict__["node_tree"] = NodeTree(name)
+
+
+class Image(ID):
+    def __init__(self, name, width, height):
+        super().__init__(name)
+        object.__setattr__(self, "source", "GENERATED")
+
+
+def unique_name(name, existing):
+    # Blender truncates names to 63 characters and appends a counter for duplicates
+    name = name[:63]
+    if name not in existing:
+        return name
+
+    i = 1
+    while "{}.{:03d}".format(name[:59], i) in existing:
+        i += 1
+    return "{}.{:03d}".format(name[:59], i)
+
+
+class BlendDataCollection:
+    def __init__(self, owner, factory):
+        self._owner = owner
+        self._factory = factory
+        self._items = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def new(self, name, *args):
+        record("{}.new".format(self._owner))
+        item = self._factory(unique_name(name, self._items), *args)
+        item._collection = self
+        self._items[item.name] = item
+        return item
+
+    def get(self, name, default=None):
+        record("{}.get".format(self._owner))
+        return self._items.get(name, default)
+
+    def remove(self, item):
+        record("{}.remove".format(self._owner))
+        del self._items[item.name]
+
+        # Removing an object also unlinks it from all collections
+        for collection in [context.scene.collection, *data.collections]:
+            if item in collection.objects._objects:
+                collection.objects._objects.remove(item)
+
+
+class CollectionObjects:
+    def __init__(self):
+        self._objects = []
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __iter__(self):
+        return iter(self._objects)
+
+    def __contains__(self, name):
+        record("CollectionObjects.__contains__")
+        return any(obj.name == name for obj in self._objects)
+
+    def link(self, obj):
+        record("CollectionObjects.link")
+        self._objects.append(obj)
+
+    def unlink(self, obj):
+        record("CollectionObjects.unlink")
+        self._objects.remove(obj)
+
+
+class CollectionChildren:
+    def __init__(self):
+        self._children = []
+
+    def __len__(self):
+        return len(self._children)
+
+    def __iter__(self):
+        return iter(self._children)
+
+    def link(self, collection):
+        record("CollectionChildren.link")
+        self._children.append(collection)
+
+
+class Collection(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["objects"] = CollectionObjects()
+        self.__dict__["children"] = CollectionChildren()
+
+
+class LayerCollectionChildren(list):
+    def get(self, name, default=None):
+        record("LayerCollectionChildren.get")
+        return next((child for child in self if child.collection.name == name), default)
+
+
+class LayerCollection(Struct):
+    # Created on access like the RNA wrappers, the exclusion state is kept by the view layer
+    def __init__(self, view_layer, collection):
+        self._view_layer = view_layer
+        self.__dict__["collection"] = collection
+
+    @property
+    def children(self):
+        return LayerCollectionChildren(LayerCollection(self._view_layer, child) for child in self.collection.children)
+
+    @property
+    def exclude(self):
+        return self._view_layer._excluded.get(id(self.collection), False)
+
+    @exclude.setter
+    def exclude(self, value):
+        self._view_layer._excluded[id(self.collection)] = value
+
+
+class ViewLayer(Struct):
+    def __init__(self, scene):
+        self._scene = scene
+        self._excluded = {}
+
+    @property
+    def layer_collection(self):
+        return LayerCollection(self, self._scene.collection)
+
+
+class BlendData:
+    def __init__(self):
+        self.meshes = BlendDataCollection("BlendDataMeshes", Mesh)
+        self.objects = BlendDataCollection("BlendDataObjects", Object)
+        self.materials = BlendDataCollection("BlendDataMaterials", Material)
+        self.images = BlendDataCollection("BlendDataImages", Image)
+        self.collections = BlendDataCollection("BlendDataCollections", Collection)
+
+
+class Scene(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["collection"] = Collection("Scene Collection")
+
+    @property
+    def objects(self):
+        return self.collection.objects
+
+
+class Context:
+    def __init__(self):
+        self.scene = Scene("Scene")
+        self.view_layer = ViewLayer(self.scene)
+        self.selected_objects = []
+
+
+class OperatorProperties:
+    def __init__(self):
+        self._set = set()
+
+    def is_property_set(self, name, ghost=True):
+        return name in self._set
+
+
+class Operator:
+    def __init__(self):
+        # Assign the defaults of the annotated properties, like Blender does for operator instances
+        for cls in reversed(type(self).__mro__):
+            for name, value in getattr(cls, "__annotations__", {}).items():
+                if isinstance(value, Property):
+                    object.__setattr__(self, name, value.keywords.get("default", value.default))
+        self.reports = []
+        self.properties = OperatorProperties()
+
+    def __setattr__(self, name, value):
+        # Properties assigned after creation count as set by the caller
+        if "properties" in self.__dict__:
+            self.properties._set.add(name)
+        object.__setattr__(self, name, value)
+
+    def report(self, type, message):
+        record("Operator.report")
+        self.reports.append((type, message))
+
+
+class Property:
+    def __init__(self, kind, default, keywords):
+        self.kind = kind
+        self.default = default
+        self.keywords = keywords
+
+
+def property_function(kind, default):
+    def function(**keywords):
+        return Property(kind, default, keywords)
+    return function
+
+
+class Menu:
+    def __init__(self, name):
+        self.name = name
+        self.functions = []
+
+    def append(self, function):
+        record("{}.append".format(self.name))
+        self.functions.append(function)
+
+    def remove(self, function):
+        record("{}.remove".format(self.name))
+        self.functions.remove(function)
+
+
+data = None
+context = None
+registered_classes = []
+
+
+def reset():
+    # Start with empty blend data and counters, like a factory startup
+    global data, context
+    data = BlendData()
+    context = Context()
+    calls.clear()
+
+    bpy = sys.modules.get("bpy")
+    if bpy is not None:
+        bpy.data = data
+        bpy.context = context
+
+
+def install():
+    reset()
+
+    menus = {}
+
+    def get_type(name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return menus.setdefault(name, Menu(name))
+
+    bpy_types = types.ModuleType("bpy.types")
+    bpy_types.Operator = Operator
+    bpy_types.__getattr__ = get_type
+
+    bpy_props = types.ModuleType("bpy.props")
+    bpy_props.StringProperty = property_function("STRING", "")
+    bpy_props.BoolProperty = property_function("BOOLEAN", False)
+    bpy_props.IntProperty = property_function("INT", 0)
+    bpy_props.FloatProperty = property_function("FLOAT", 0.0)
+    bpy_props.EnumProperty = property_function("ENUM", "")
+
+    def register_class(cls):
+        record("register_class")
+        registered_classes.append(cls)
+
+    def unregister_class(cls):
+        record("unregister_class")
+        registered_classes.remove(cls)
+
+    bpy_utils = types.ModuleType("bpy.utils")
+    bpy_utils.register_class = register_class
+    bpy_utils.unregister_class = unregister_class
+
+    bpy = types.ModuleType("bpy")
+    bpy.__path__ = []
+    bpy.types = bpy_types
+    bpy.props = bpy_props
+    bpy.utils = bpy_utils
+    bpy.data = data
+    bpy.context = context
+
+    class ImportHelper:
+        filepath: bpy_props.StringProperty(subtype="FILE_PATH")
+
+    class ExportHelper:
+        filepath: bpy_props.StringProperty(subtype="FILE_PATH")
+
+    io_utils = types.ModuleType("bpy_extras.io_utils")
+    io_utils.ImportHelper = ImportHelper
+    io_utils.ExportHelper = ExportHelper
+
+    bpy_extras = types.ModuleType("bpy_extras")
+    bpy_extras.__path__ = []
+    bpy_extras.io_utils = io_utils
+
+    sys.modules.update({
+        "bpy": bpy,
+        "bpy.types": bpy_types,
+        "bpy.props": bpy_props,
+        "bpy.utils": bpy_utils,
+        "bpy_extras": bpy_extras,
+        "bpy_extras.io_utils": io_utils,
+        "mathutils": types.ModuleType("mathutils"),
+    })
+
+    return bpy
@@ -17,40 +17,59 @@
 # You should have received a copy of the GNU General Public License
 # along with OpenAWE. If not, see <http://www.gnu.org/licenses/>.
 
-import bpy
+# Blender modules are only imported on registration, so the bpy free parts like the batch converter can be used
+# outside of Blender. Registration itself only loads the operator stubs, their implementation is imported on first use.
 
-from bpy.utils import register_class, unregister_class
 
-from . import northlight_binmsh_import
-from . import northlight_binfol_import
-
-classes = [
-    northlight_binmsh_import.NorthlightImport,
-    northlight_binfol_import.NorthlightFoliageImport
-]
+def get_classes():
+    from . import operators
+    return operators.classes
 
 
 def menu_func_northlight_import(self, context):
-    self.layout.operator(northlight_binmsh_import.NorthlightImport.bl_idname, text="Northlight Mesh (.binmsh, .binfbx)")
+    self.layout.operator("northlight.binmsh_import", text="Northlight Mesh (.binmsh, .binfbx)")
+
+
+def menu_func_northlight_reimport(self, context):
+    self.layout.operator("northlight.binmsh_reimport", text="Northlight Mesh Reimport (.binmsh, .binfbx, .binfol)")
 
 
 def menu_func_northlight_foliage_import(self, context):
-    self.layout.operator(northlight_binfol_import.NorthlightFoliageImport.bl_idname, text="Northlight Foliage (.binfol)")
+    self.layout.operator("northlight.binfol_import", text="Northlight Foliage (.binfol)")
+
+
+def menu_func_northlight_export(self, context):
+    self.layout.operator("northlight.binmsh_export", text="Northlight Mesh (.binmsh)")
+
+
+def menu_func_northlight_lod(self, context):
+    self.layout.operator("northlight.set_lod", text="Northlight LOD")
 
 
 def register():
-    for c in classes:
-        print(c)
+    import bpy
+    from bpy.utils import register_class
+
+    for c in get_classes():
         register_class(c)
     bpy.types.TOPBAR_MT_file_import.append(menu_func_northlight_import)
     bpy.types.TOPBAR_MT_file_import.append(menu_func_northlight_foliage_import)
+    bpy.types.TOPBAR_MT_file_import.append(menu_func_northlight_reimport)
+    bpy.types.TOPBAR_MT_file_export.append(menu_func_northlight_export)
+    bpy.types.VIEW3D_MT_view.append(menu_func_northlight_lod)
 
 
 def unregister():
-    for c in classes:
+    import bpy
+    from bpy.utils import unregister_class
+
+    for c in get_classes():
         unregister_class(c)
     bpy.types.TOPBAR_MT_file_import.remove(menu_func_northlight_import)
     bpy.types.TOPBAR_MT_file_import.remove(menu_func_northlight_foliage_import)
+    bpy.types.TOPBAR_MT_file_import.remove(menu_func_northlight_reimport)
+    bpy.types.TOPBAR_MT_file_export.remove(menu_func_northlight_export)
+    bpy.types.VIEW3D_MT_view.remove(menu_func_northlight_lod)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,377 @@
+# OpenAWE - A reimplementation of Remedy's Alan Wake Engine
+#
+# OpenAWE is the legal property of its developers, whose names
+# can be found in the AUTHORS file distributed with this source
+# distribution.
+#
+# OpenAWE is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# OpenAWE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OpenAWE. If not, see <http://www.gnu.org/licenses/>.
+
+# Batch conversion of all Northlight meshes in a directory, using one worker process per core.
+#
+#   python -m io_mesh_northlight.batch INPUT OUTPUT [--jobs N]
+#       Parses the meshes without Blender and writes one .npz archive per file
+#
+#   python -m io_mesh_northlight.batch INPUT OUTPUT --blender /path/to/blender [--jobs N] [--timeout SECONDS]
+#       Builds the meshes in N background Blender instances and writes one .blend file per file. A Blender taking
+#       longer than the timeout for a file is killed and restarted, and the file is recorded as failed
+#
+# Completed files are recorded in OUTPUT/manifest.jsonl and skipped when running again.
+
+import io
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import argparse
+import threading
+import contextlib
+import subprocess
+import multiprocessing
+
+import numpy as np
+
+from .binmsh_loader import BINMSH, read_binfol
+
+
+EXTENSIONS = (".binmsh", ".binfbx", ".binfol")
+MANIFEST = "manifest.jsonl"
+RESULT_PREFIX = "NORTHLIGHT_RESULT "
+
+
+def find_files(input_directory):
+    files = []
+    for directory, _, filenames in os.walk(input_directory):
+        for filename in filenames:
+            if filename.lower().endswith(EXTENSIONS):
+                files.append(os.path.relpath(os.path.join(directory, filename), input_directory))
+
+    return sorted(files)
+
+
+def load_mesh_file(path):
+    # The loader reports everything it parses, which would flood the output of the workers
+    with open(path, 'rb') as f, contextlib.redirect_stdout(io.StringIO()):
+        if path.lower().endswith(".binfol"):
+            return read_binfol(f)
+        return BINMSH(f)
+
+
+def write_npz(binmsh, destination):
+    arrays = {"bone_names": np.array(binmsh.bone_names, dtype=str)}
+    materials = []
+    for i, m in enumerate(binmsh.meshs):
+        prefix = "mesh{}.".format(i)
+        arrays[prefix + "lod"] = np.array(m.lod)
+        arrays[prefix + "positions"] = np.asarray(m.positions, dtype=np.float32).reshape(-1, 3)
+        arrays[prefix + "faces"] = np.asarray(m.faces, dtype=np.int32).reshape(-1, 3)
+        arrays[prefix + "bone_ids"] = np.asarray(m.bone_ids, dtype=np.int16).reshape(-1, 4)
+        arrays[prefix + "bone_weights"] = np.asarray(m.bone_weights, dtype=np.float32).reshape(-1, 4)
+        arrays[prefix + "bone_map"] = np.asarray(m.bone_map, dtype=np.int32)
+        for j, uv in enumerate(m.uv_layers):
+            arrays[prefix + "uv{}".format(j)] = np.asarray(uv, dtype=np.float32).reshape(-1, 2)
+        for j, color in enumerate(m.vertex_colors):
+            arrays[prefix + "color{}".format(j)] = np.asarray(color, dtype=np.float32).reshape(-1, 4)
+
+        materials.append({
+            "type": m.material.type,
+            "name": m.material.name,
+            "properties": m.material.properties,
+            "uniforms": m.material.uniforms,
+        })
+
+    arrays["materials"] = np.array(json.dumps(materials))
+
+    with open(destination, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def convert_npz(task):
+    source, destination = task
+    start = time.perf_counter()
+    try:
+        binmsh = load_mesh_file(source)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+        # Write next to the destination first, so an interrupted run never leaves a truncated output
+        write_npz(binmsh, destination + ".tmp")
+        os.replace(destination + ".tmp", destination)
+    except Exception as e:
+        return task, {"error": "{}: {}".format(type(e).__name__, e)}
+
+    return task, {
+        "triangles": sum(len(m.faces) for m in binmsh.meshs),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def clear_blend_data():
+    import bpy
+
+    bpy.data.batch_remove([
+        *bpy.data.objects,
+        *bpy.data.meshes,
+        *bpy.data.materials,
+        *bpy.data.images,
+        *bpy.data.collections,
+    ])
+
+
+def convert_blend(source, destination):
+    import bpy
+
+    start = time.perf_counter()
+    clear_blend_data()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if source.lower().endswith(".binfol"):
+            bpy.ops.northlight.binfol_import(filepath=source)
+        else:
+            bpy.ops.northlight.binmsh_import(filepath=source)
+
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    bpy.ops.wm.save_as_mainfile(filepath=destination + ".tmp", check_existing=False, copy=True)
+    os.replace(destination + ".tmp", destination)
+
+    return {
+        "triangles": sum(len(mesh.polygons) for mesh in bpy.data.meshes),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def blender_worker():
+    # Runs inside of a background Blender, converting the files given on stdin one per line
+    from . import register
+
+    register()
+
+    for line in sys.stdin:
+        source, destination = line.rstrip("\n").split("\t")
+        try:
+            result = convert_blend(source, destination)
+        except Exception as e:
+            result = {"error": "{}: {}".format(type(e).__name__, e)}
+
+        sys.stdout.write(RESULT_PREFIX + json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+
+class BlenderProcess:
+    def __init__(self, blender, timeout):
+        self.timeout = timeout
+        self.timed_out = False
+
+        package_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        expression = "import sys; sys.path.insert(0, {!r}); from {} import batch; batch.blender_worker()".format(
+            package_directory,
+            __package__
+        )
+
+        self.process = subprocess.Popen(
+            [blender, "-b", "--factory-startup", "--python-expr", expression],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1
+        )
+
+    def convert(self, source, destination):
+        self.process.stdin.write("{}\t{}\n".format(source, destination))
+        self.process.stdin.flush()
+
+        # A Blender hanging on a file is killed, which ends its output below
+        watchdog = threading.Timer(self.timeout, self.kill)
+        watchdog.start()
+        try:
+            # Blender writes its own messages to stdout too, so only pick up the result line
+            for line in self.process.stdout:
+                if line.startswith(RESULT_PREFIX):
+                    return json.loads(line[len(RESULT_PREFIX):])
+        finally:
+            watchdog.cancel()
+
+        return None
+
+    def kill(self):
+        self.timed_out = True
+        self.process.kill()
+
+    def is_running(self):
+        return self.process.poll() is None
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+def run_blender(blender, tasks, jobs, timeout, on_result):
+    work = queue.Queue()
+    for task in tasks:
+        work.put(task)
+
+    def worker():
+        process = None
+        while True:
+            try:
+                source, destination = work.get_nowait()
+            except queue.Empty:
+                break
+
+            # Start Blender for the first file and again after it crashed or hung. The watchdog might also have
+            # fired just after the previous file was done
+            if process is None or not process.is_running():
+                try:
+                    process = BlenderProcess(blender, timeout)
+                except OSError as e:
+                    process = None
+                    on_result((source, destination), {"error": "Could not start Blender: {}".format(e)})
+                    continue
+
+            try:
+                result = process.convert(source, destination)
+            except BrokenPipeError:
+                result = None
+
+            if result is None:
+                exit_code = process.process.wait()
+                if process.timed_out:
+                    result = {"error": "Timed out after {} s".format(timeout)}
+                else:
+                    result = {"error": "Blender exited with {}".format(exit_code)}
+
+            on_result((source, destination), result)
+
+        if process is not None:
+            process.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(min(jobs, len(tasks)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_npz(tasks, jobs, on_result):
+    with multiprocessing.Pool(jobs) as pool:
+        for task, result in pool.imap_unordered(convert_npz, tasks):
+            on_result(task, result)
+
+
+def load_manifest(path):
+    completed = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Last line of an interrupted run
+                if "error" not in entry:
+                    completed[entry["file"]] = entry
+
+    return completed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert all Northlight meshes in a directory")
+    parser.add_argument("input", help="Directory searched recursively for .binmsh, .binfbx and .binfol files")
+    parser.add_argument("output", help="Directory receiving one converted file per mesh file and the manifest")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("--blender", help="Blender executable to build .blend files with, instead of writing .npz")
+    parser.add_argument("--force", action="store_true", help="Convert all files again, ignoring the manifest")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=600.0,
+        help="Seconds a Blender worker may take for one file before it is killed and restarted"
+    )
+    args = parser.parse_args()
+
+    if args.blender and shutil.which(args.blender) is None:
+        parser.error("Blender executable {} not found".format(args.blender))
+
+    output_format = "blend" if args.blender else "npz"
+    manifest_path = os.path.join(args.output, MANIFEST)
+    completed = {} if args.force else load_manifest(manifest_path)
+
+    tasks = []
+    sources = {}
+    skipped = 0
+    for filename in find_files(args.input):
+        source = os.path.abspath(os.path.join(args.input, filename))
+        destination = os.path.abspath(os.path.join(args.output, "{}.{}".format(filename, output_format)))
+        stat = os.stat(source)
+
+        entry = completed.get(filename)
+        if (entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime and
+                entry["format"] == output_format and os.path.exists(destination)):
+            skipped += 1
+            continue
+
+        tasks.append((source, destination))
+        sources[source] = (filename, stat)
+
+    print("{} files to convert, {} already converted".format(len(tasks), skipped))
+
+    os.makedirs(args.output, exist_ok=True)
+    manifest = open(manifest_path, 'a')
+    lock = threading.Lock()
+    totals = {"files": 0, "errors": 0, "bytes": 0, "triangles": 0}
+    start = time.perf_counter()
+
+    def on_result(task, result):
+        filename, stat = sources[task[0]]
+        entry = dict(result, file=filename, size=stat.st_size, mtime=stat.st_mtime, format=output_format)
+
+        with lock:
+            manifest.write(json.dumps(entry) + "\n")
+            manifest.flush()
+
+            totals["files"] += 1
+            if "error" in result:
+                totals["errors"] += 1
+                print("{}: {}".format(filename, result["error"]), file=sys.stderr)
+            else:
+                totals["bytes"] += stat.st_size
+                totals["triangles"] += result["triangles"]
+
+            if totals["files"] % 100 == 0:
+                print("{}/{} files".format(totals["files"], len(tasks)))
+
+    try:
+        if args.blender:
+            run_blender(args.blender, tasks, args.jobs, args.timeout, on_result)
+        else:
+            run_npz(tasks, args.jobs, on_result)
+    finally:
+        manifest.close()
+
+    seconds = max(time.perf_counter() - start, 1e-9)
+    print("Converted {} files ({} failed) in {:.1f} s: {:.1f} files/s, {:.1f} MB/s, {:.0f} triangles/s".format(
+        totals["files"] - totals["errors"],
+        totals["errors"],
+        seconds,
+        totals["files"] / seconds,
+        totals["bytes"] / seconds / 1e6,
+        totals["triangles"] / seconds
+    ))
+
+    if totals["errors"] > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
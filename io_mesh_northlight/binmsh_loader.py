@@ -20,6 +20,7 @@
 import os
 import io
 import enum
+import hashlib
 import dataclasses
 from struct import unpack
 
@@ -42,12 +43,27 @@ class DataType(enum.IntEnum):
     VEC4SI = 5
 
 
+DATA_SIZES = {
+    DataType.VEC3F: 12,
+    DataType.VEC4S: 8,
+    DataType.VEC2S: 4,
+    DataType.VEC4BF: 4,
+    DataType.VEC4BI: 4,
+    DataType.VEC4SI: 8,
+}
+
+
 @dataclasses.dataclass
 class Material:
     type: str
     name: str
     properties: int
     uniforms: dict
+    content_hash: str = ""
+    blend_mode: int = 0
+    cull_mode: int = 0
+    flags: int = 0
+    uniform_types: dict = dataclasses.field(default_factory=dict)
 
 
 @dataclasses.dataclass
@@ -61,6 +77,7 @@ class Mesh:
     uv_layers: []
     vertex_colors: []
     material: Material
+    content_hash: str = ""
 
 
 def read_string(binmsh):
@@ -70,6 +87,13 @@ def read_string(binmsh):
     return string
 
 
+def hash_bytes(*chunks):
+    content_hash = hashlib.blake2b(digest_size=16)
+    for chunk in chunks:
+        content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
 def read_data(binmsh, data_type):
     data = None
     match data_type:
@@ -162,6 +186,8 @@ class BINMSH:
         material_count = unpack('I', binmsh.read(4))[0]
         print(material_count)
         for i in range(material_count):
+            material_start = binmsh.tell()
+
             if version >= 43:
                 binmsh.seek(4, 1)  # Unknown (Always 4?)
 
@@ -191,6 +217,7 @@ class BINMSH:
 
             num_attributes = unpack('I', binmsh.read(4))[0]
             uniforms = {}
+            uniform_types = {}
             for i in range(num_attributes):
                 attribute_name = read_string(binmsh)
                 data_type = unpack('I', binmsh.read(4))[0]
@@ -214,6 +241,7 @@ class BINMSH:
                         raise Exception("Invalid data type for {}".format(attribute_name))
 
                 uniforms[attribute_name] = data
+                uniform_types[attribute_name] = data_type
 
             print("Material Shader: {}".format(shader_name))
             print("Material Blend Mode: {}".format(blend_mode))
@@ -221,7 +249,23 @@ class BINMSH:
             print("Material Properties: {}".format(hex(properties)))
             print("Material Flags: {}".format(hex(material_flags)))
             print(uniforms)
-            materials.append(Material(shader_name, material_name, properties, uniforms))
+
+            # Hash the raw material record, so identical materials can be recognized without comparing uniforms
+            material_end = binmsh.tell()
+            binmsh.seek(material_start)
+            material_hash = hash_bytes(binmsh.read(material_end - material_start))
+
+            materials.append(Material(
+                shader_name,
+                material_name,
+                properties,
+                uniforms,
+                material_hash,
+                blend_mode,
+                cull_mode,
+                material_flags,
+                uniform_types
+            ))
 
             print("------------------------------------------------------")
 
@@ -320,13 +364,27 @@ class BINMSH:
             if version >= 43:
                 binmsh.seek(13, 1)
 
-                # Identity bone map since all games >=Quantum Break use the bone indices directly
-                # TODO: Make sure, that only the bones used in this part mesh are used
+                # Identity bone map since all games >=Quantum Break use the bone indices directly, the bones not
+                # used by this part mesh are skipped when creating its vertex groups
                 bone_map = range(bone_count)
             else:
                 bone_map_count = unpack('I', binmsh.read(4))[0]
                 bone_map = unpack(str(bone_map_count) + 'B', binmsh.read(bone_map_count))
 
+            # Hash the byte ranges of this mesh together with its layout and bones to identify identical geometry
+            vertex_stride = sum(DATA_SIZES[a[1]] for a in vertex_attributes if not a[2])
+            secondary_vertex_stride = sum(DATA_SIZES[a[1]] for a in vertex_attributes if a[2])
+            index_start = face_offset * indices_type
+            content_hash = hash_bytes(
+                repr(vertex_attributes).encode(),
+                "\n".join(self.bone_names[b] for b in bone_map).encode(),
+                vertex_buffer.getbuffer()[vertex_offset:vertex_offset + vertex_count * vertex_stride],
+                secondary_buffer.getbuffer()[
+                    secondary_vertex_offset:secondary_vertex_offset + vertex_count * secondary_vertex_stride
+                ] if secondary_buffer is not None else b"",
+                index_buffer.getbuffer()[index_start:index_start + face_count * 3 * indices_type]
+            )
+
             mesh_indices = []
             mesh_positions = []
             mesh_bone_indices = []
@@ -383,6 +441,17 @@ class BINMSH:
                 bone_map,
                 uv_layers,
                 mesh_colors,
-                materials[i % material_count]
+                materials[i % material_count],
+                content_hash
             )
             self.meshs.append(mesh)
+
+
+def read_binfol(binfol):
+    version = unpack("I", binfol.read(4))[0]
+    if version != 19:
+        raise Exception("Unsupported binfol version")
+
+    mesh_data_size = unpack("I", binfol.read(4))[0]
+    mesh_data = io.BytesIO(binfol.read(mesh_data_size))
+    return BINMSH(mesh_data)
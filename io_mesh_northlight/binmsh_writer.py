@@ -0,0 +1,319 @@
+# OpenAWE - A reimplementation of Remedy's Alan Wake Engine
+#
+# OpenAWE is the legal property of its developers, whose names
+# can be found in the AUTHORS file distributed with this source
+# distribution.
+#
+# OpenAWE is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# OpenAWE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OpenAWE. If not, see <http://www.gnu.org/licenses/>.
+
+import struct
+import dataclasses
+
+import numpy as np
+
+from .binmsh_loader import ComponentType, DataType
+
+
+# Inverse of the component and data type mapping done while loading
+COMPONENT_CODES = {
+    ComponentType.POSITION: 2,
+    ComponentType.COLOR: 4,
+    ComponentType.BONE_INDEX: 5,
+    ComponentType.BONE_WEIGHT: 5,
+    ComponentType.TEX_COORD: 7,
+    ComponentType.NORMAL: 8,
+}
+
+DATA_CODES = {
+    DataType.VEC3F: 0,
+    DataType.VEC4S: 1,
+    DataType.VEC2S: 2,
+    DataType.VEC4BF: 3,
+    DataType.VEC4BI: 5,
+}
+
+DATA_FORMATS = {
+    DataType.VEC3F: ('<f4', 3),
+    DataType.VEC4S: ('<u2', 4),
+    DataType.VEC2S: ('<u2', 2),
+    DataType.VEC4BF: ('u1', 4),
+    DataType.VEC4BI: ('i1', 4),
+}
+
+
+def quantize(data, scale, dtype, name):
+    limit = np.iinfo(dtype).max
+    data = np.rint(data * scale)
+    if len(data) > 0 and (data.min() < 0 or data.max() > limit):
+        raise Exception("{} outside of the range the format can store".format(name))
+
+    return data.astype(dtype)
+
+
+def encode_data(data, data_type):
+    base, count = DATA_FORMATS[data_type]
+    data = np.asarray(data, dtype=np.float64 if data_type != DataType.VEC4BI else np.int64).reshape(-1, count)
+
+    match data_type:
+        case DataType.VEC3F:
+            data = data.astype(base)
+        case DataType.VEC4S:
+            data = quantize(data, 65535.0, base, "Values")
+        case DataType.VEC2S:
+            # Tiled uvs can not be stored, U has to be within [0, 16) and V within (-15, 1]
+            data = np.column_stack((data[:, 0], 1.0 - data[:, 1]))
+            data = quantize(data, 4096.0, base, "UV coordinates")
+        case DataType.VEC4BF:
+            data = quantize(data, 255.0, base, "Colors or bone weights")
+        case DataType.VEC4BI:
+            data = data.astype(base)
+
+    return data
+
+
+def get_vertex_attributes(mesh):
+    attributes = [(ComponentType.POSITION, DataType.VEC3F, mesh.positions)]
+
+    if len(mesh.bone_ids) > 0:
+        attributes.append((ComponentType.BONE_INDEX, DataType.VEC4BI, mesh.bone_ids))
+        attributes.append((ComponentType.BONE_WEIGHT, DataType.VEC4BF, mesh.bone_weights))
+
+    for uv in mesh.uv_layers:
+        attributes.append((ComponentType.TEX_COORD, DataType.VEC2S, uv))
+
+    for color in mesh.vertex_colors:
+        attributes.append((ComponentType.COLOR, DataType.VEC4BF, color))
+
+    return attributes
+
+
+def encode_vertices(attributes, vertex_count):
+    # Interleave all attributes at once through a packed structured array
+    vertex_format = np.dtype([
+        ("a{}".format(i), *DATA_FORMATS[data_type]) for i, (_, data_type, _) in enumerate(attributes)
+    ])
+
+    vertices = np.empty(vertex_count, vertex_format)
+    for i, (_, data_type, data) in enumerate(attributes):
+        vertices["a{}".format(i)] = encode_data(data, data_type)
+
+    return vertices.view(np.uint8).reshape(-1)
+
+
+def encode_indices(faces, vertex_count):
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+    if vertex_count > 0x10000 or (len(faces) > 0 and faces.max() >= vertex_count):
+        raise Exception("Mesh exceeds the 16 bit index range")
+
+    return faces.astype('<u2').view(np.uint8).reshape(-1)
+
+
+def split_mesh(mesh, limit=0x10000):
+    # Indices are 16 bit, so split larger meshs by triangle ranges into submeshs of at most limit vertices each
+    faces = np.asarray(mesh.faces, dtype=np.int64).reshape(-1, 3)
+    if len(mesh.positions) <= limit:
+        return [mesh]
+
+    meshs = []
+    start = 0
+    while start < len(faces):
+        # The chunk ends before the triangle using the first vertex beyond the limit. Only look at a window of the
+        # following triangles, growing it until it contains that vertex or reaches the end
+        window = 4 * limit
+        while True:
+            _, first_corners = np.unique(faces[start:start + window].reshape(-1), return_index=True)
+            if len(first_corners) > limit:
+                end = start + np.partition(first_corners, limit)[limit] // 3
+                break
+            if start + window >= len(faces):
+                end = len(faces)
+                break
+            window *= 2
+
+        vertices, chunk_faces = np.unique(faces[start:end], return_inverse=True)
+        meshs.append(dataclasses.replace(
+            mesh,
+            positions=np.asarray(mesh.positions).reshape(-1, 3)[vertices],
+            faces=chunk_faces.reshape(-1, 3),
+            bone_ids=np.asarray(mesh.bone_ids)[vertices] if len(mesh.bone_ids) > 0 else mesh.bone_ids,
+            bone_weights=np.asarray(mesh.bone_weights)[vertices] if len(mesh.bone_weights) > 0 else mesh.bone_weights,
+            uv_layers=[np.asarray(uv).reshape(-1, 2)[vertices] for uv in mesh.uv_layers],
+            vertex_colors=[np.asarray(color).reshape(-1, 4)[vertices] for color in mesh.vertex_colors]
+        ))
+        start = end
+
+    return meshs
+
+
+def get_bounds(positions):
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    if len(positions) == 0:
+        return (0.0, 0.0, 0.0, 0.0), (0.0,) * 6
+
+    box_min = positions.min(axis=0)
+    box_max = positions.max(axis=0)
+    center = (box_min + box_max) / 2.0
+    radius = np.sqrt(((positions - center) ** 2).sum(axis=1).max())
+
+    return (*center, radius), (*box_min, *box_max)
+
+
+def get_uniform_type(value):
+    if value is None:
+        return 8
+    if isinstance(value, bool):
+        return 12
+    if isinstance(value, str):
+        return 7
+
+    match len(value):
+        case 1:
+            return 0
+        case 2:
+            return 1
+        case 3:
+            return 2
+        case 4:
+            return 3
+
+    raise Exception("Invalid uniform value {}".format(value))
+
+
+class Output:
+    # Writes sequentially into a preallocated buffer or, without buffer, only counts the bytes to allocate
+    def __init__(self, buffer=None):
+        self.buffer = buffer
+        self.offset = 0
+
+    def pack(self, fmt, *values):
+        if self.buffer is not None:
+            struct.pack_into('<' + fmt, self.buffer, self.offset, *values)
+        self.offset += struct.calcsize('<' + fmt)
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        size = data.nbytes
+        if self.buffer is not None:
+            memoryview(self.buffer)[self.offset:self.offset + size] = data
+        self.offset += size
+
+    def write_string(self, string):
+        data = (string + "\x00").encode("ascii")
+        self.pack('I', len(data))
+        self.write(data)
+
+
+def write_material(out, version, material):
+    if version >= 20:
+        out.write_string(material.name)
+
+    out.write_string(material.type)
+    out.pack('IIII', material.properties, material.blend_mode, material.cull_mode, material.flags)
+
+    out.pack('I', len(material.uniforms))
+    for name, value in material.uniforms.items():
+        # Keep the type of loaded uniforms, since some values like textures can be stored with several types
+        uniform_type = material.uniform_types.get(name, get_uniform_type(value))
+        out.write_string(name)
+        out.pack('I', uniform_type)
+
+        match uniform_type:
+            case 0 | 1 | 2 | 3:
+                out.pack(str(len(value)) + 'f', *value)
+            case 7 | 9:
+                out.write_string(value)
+            case 12:
+                out.pack('I', int(value))
+
+
+def write_binmsh(f, version, bone_names, meshs):
+    if version not in (19, 20, 21):
+        raise Exception("Unsupported mesh version for writing")
+
+    # Encode all vertex and index data up front, so that only their size is needed for the layout
+    vertex_buffers = []
+    index_buffers = []
+    layouts = []
+    for mesh in meshs:
+        vertex_count = len(mesh.positions)
+        attributes = get_vertex_attributes(mesh)
+        layouts.append([(COMPONENT_CODES[c], DATA_CODES[d]) for c, d, _ in attributes])
+        vertex_buffers.append(encode_vertices(attributes, vertex_count))
+        index_buffers.append(encode_indices(mesh.faces, vertex_count))
+
+    all_positions = [np.asarray(mesh.positions, dtype=np.float64).reshape(-1, 3) for mesh in meshs]
+    global_sphere, global_box = get_bounds(np.concatenate(all_positions) if all_positions else [])
+    lod_count = max((mesh.lod for mesh in meshs), default=0) + 1
+
+    def serialize(out):
+        out.pack('I', version)
+        out.pack('I', sum(len(b) for b in vertex_buffers))
+        out.pack('I', sum(len(b) for b in index_buffers) // 2)
+        out.pack('I', 2)  # Index size
+        out.pack('I', 0)  # Flags
+
+        for vertex_buffer in vertex_buffers:
+            out.write(vertex_buffer)
+        for index_buffer in index_buffers:
+            out.write(index_buffer)
+
+        out.pack('I', len(bone_names))
+        for bone_name in bone_names:
+            out.write_string(bone_name)
+
+            # Identity inverse rest matrix + Bounding sphere for bone
+            out.pack('16f', 1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0)
+
+        out.pack('4f', *global_sphere)
+        out.pack('6f', *global_box)
+
+        out.pack('I', lod_count)
+
+        # One material per mesh, since meshs select their material by their index
+        out.pack('I', len(meshs))
+        for mesh in meshs:
+            write_material(out, version, mesh.material)
+
+        out.pack('I', len(meshs))
+        vertex_offset = 0
+        face_offset = 0
+        for mesh, positions, layout, vertex_buffer, index_buffer in zip(
+                meshs, all_positions, layouts, vertex_buffers, index_buffers):
+            out.pack('I', mesh.lod)
+            out.pack('I', len(positions))
+            out.pack('I', len(index_buffer) // 6)
+            out.pack('I', vertex_offset)
+            out.pack('I', face_offset)
+            out.pack('I', 0)  # Unknown
+
+            if version == 21:
+                out.pack('4f', *get_bounds(positions)[0])
+
+            out.pack('B', len(layout))
+            for component_code, data_code in layout:
+                out.pack('BBB', 0, component_code, data_code)
+
+            out.pack('I', len(mesh.bone_map))
+            out.pack(str(len(mesh.bone_map)) + 'B', *mesh.bone_map)
+
+            vertex_offset += len(vertex_buffer)
+            face_offset += len(index_buffer) // 2
+
+    counter = Output()
+    serialize(counter)
+
+    buffer = bytearray(counter.offset)
+    serialize(Output(buffer))
+
+    f.write(buffer)
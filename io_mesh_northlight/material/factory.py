@@ -91,6 +91,9 @@ class Factory:
         image = bpy.data.images.new(file, 32, 32)
         image.source = "FILE"
 
+        # The image name gets a suffix for duplicates and is cut at 63 characters, so keep the full path
+        image["northlight_path"] = file
+
         image_node.image = image
         image_node.location = (self.input_column, self.input_column_offset)
         self.input_column_offset -= 300
@@ -18,64 +18,35 @@
 # along with OpenAWE. If not, see <http://www.gnu.org/licenses/>.
 
 import bpy
-import bpy_extras
 
-import enum
-import io
 import os.path
-import dataclasses
 
-from struct import unpack
-
-from .material import GlobalFlags
-from .material import standardmaterial
-
-from .binmsh_loader import BINMSH
+from .binmsh_loader import read_binfol
 
 from .util import *
 
 
-class NorthlightFoliageImport(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
-    bl_idname = "northlight.binfol_import"
-    bl_label = "Import Northlight foliage mesh file"
-    bl_description = "Import Northlight foliage mesh file"
-
-    filename_ext = ".binfol"
-
-    filter_glob: bpy.props.StringProperty(default='*.binfol', options={"HIDDEN"})
-
-    def execute(self, context):
-        f = open(self.filepath, 'rb')
-
-        version = unpack("I", f.read(4))[0]
-        if version != 19:
-            raise Exception("Unsupported binfol version")
-
-        mesh_data_size = unpack("I", f.read(4))[0]
-        mesh_data = io.BytesIO(f.read(mesh_data_size))
-        binmsh = BINMSH(mesh_data)
-
-        bone_names = binmsh.bone_names
-
-        for i, m in zip(range(len(binmsh.meshs)), binmsh.meshs):
-            mesh = bpy.data.meshes.new("mesh{}.lod{}".format(i, m.lod))
-            obj = bpy.data.objects.new("mesh{}.lod{}".format(i, m.lod), mesh)
-
-            # Create the meshs basic geometry
-            mesh.from_pydata(m.positions, [], m.faces)
+def import_binfol(operator, context):
+    filepath = os.path.normpath(operator.filepath)
+    f = open(operator.filepath, 'rb')
 
-            # Create the uv layers
-            add_uv_layers(mesh, m.faces, m.uv_layers)
+    binmsh = read_binfol(f)
 
-            # Create the color layers
-            add_vertex_colors(mesh, m.faces, m.vertex_colors)
+    bone_names = binmsh.bone_names
 
-            # Create vertex groups for bones
-            add_bone_data(obj, m.bone_map, bone_names, m.bone_ids, m.bone_weights)
+    for i, m in zip(range(len(binmsh.meshs)), binmsh.meshs):
+        obj = create_object(
+            "mesh{}.lod{}".format(i, m.lod),
+            m,
+            bone_names,
+            vertex_colors=True,
+            reuse_meshes=operator.reuse_meshes,
+            weld_distance=operator.weld_distance if operator.weld_vertices else 0.0
+        )
+        tag_object(obj, filepath, i, m.lod)
 
-            # Create material for object
-            add_material(obj, m.material)
+        link_object(context, obj, filepath, m.lod)
 
-            bpy.context.scene.collection.objects.link(obj)
+    set_active_lod(context, get_file_collection(context, filepath), operator.active_lod)
 
-        return {'FINISHED'}
\ No newline at end of file
+    return {'FINISHED'}
@@ -0,0 +1,217 @@
+# OpenAWE - A reimplementation of Remedy's Alan Wake Engine
+#
+# OpenAWE is the legal property of its developers, whose names
+# can be found in the AUTHORS file distributed with this source
+# distribution.
+#
+# OpenAWE is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# OpenAWE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OpenAWE. If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import json
+
+import numpy as np
+
+from .binmsh_loader import Material, Mesh
+from .binmsh_writer import split_mesh, write_binmsh
+
+from .material import GlobalFlags
+
+
+def get_lod(obj):
+    lod = obj.get("northlight_lod")
+    if lod is not None:
+        return lod
+
+    # Objects created by hand can select their LOD through a name ending in .lod<lod>
+    match = re.search(r"\.lod(\d+)", obj.name)
+    return int(match.group(1)) if match is not None else 0
+
+
+def get_export_order(obj):
+    # Imported objects keep the order of their submeshs, all others follow in natural order of their names, so that
+    # mesh2 comes before mesh10
+    submesh = obj.get("northlight_submesh")
+    name = [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", obj.name)]
+    return (submesh is None, submesh or 0, name)
+
+
+def get_material(obj):
+    material = obj.active_material
+
+    # Materials created by the importer carry their original record
+    if material is not None and "northlight_material" in material:
+        record = json.loads(material["northlight_material"])
+        return Material(
+            record["type"],
+            record["name"],
+            record["properties"],
+            record["uniforms"],
+            blend_mode=record["blend_mode"],
+            cull_mode=record["cull_mode"],
+            flags=record["flags"],
+            uniform_types=record.get("uniform_types", {})
+        )
+
+    name = material.name if material is not None else obj.name
+
+    properties = 0
+    if any(modifier.type == "ARMATURE" for modifier in obj.modifiers):
+        properties |= GlobalFlags.SKINNING_MATRICES
+
+    uniforms = {
+        "g_sColorMap": "",
+        "g_vColorMultiplier": (1.0, 1.0, 1.0, 1.0),
+    }
+
+    # Pick up the inputs of materials created by hand through their node labels
+    if material is not None and material.node_tree is not None:
+        for node in material.node_tree.nodes:
+            if node.label == "g_sColorMap" and node.type == "TEX_IMAGE" and node.image is not None:
+                uniforms["g_sColorMap"] = node.image.get("northlight_path", node.image.name)
+            elif node.label == "g_vColorMultiplier" and node.type == "RGB":
+                uniforms["g_vColorMultiplier"] = tuple(node.outputs[0].default_value)
+
+    return Material("standardmaterial", name, properties, uniforms)
+
+
+def get_bone_groups(obj):
+    # With an armature, only the vertex groups named after one of its bones are skin weights
+    for modifier in obj.modifiers:
+        if modifier.type == "ARMATURE" and modifier.object is not None and modifier.object.type == "ARMATURE":
+            bones = modifier.object.data.bones
+            return {group.index for group in obj.vertex_groups if group.name in bones}
+
+    return {group.index for group in obj.vertex_groups}
+
+
+def get_bone_data(obj, mesh, bone_names):
+    vertex_count = len(mesh.vertices)
+    group_names = [group.name for group in obj.vertex_groups]
+    bone_groups = get_bone_groups(obj)
+    if not bone_groups:
+        return None
+
+    # Vertex group weights have no bulk accessor, so this is one Python iteration per vertex. Only the influences
+    # of bone groups are kept, and only the four strongest of them
+    group_ids = np.zeros((vertex_count, 4), dtype=np.int64)
+    group_weights = np.zeros((vertex_count, 4), dtype=np.float64)
+    for vertex in mesh.vertices:
+        influences = [(g.weight, g.group) for g in vertex.groups if g.weight > 0 and g.group in bone_groups]
+        if not influences:
+            continue
+
+        influences.sort(reverse=True)
+        for j, (weight, group) in enumerate(influences[:4]):
+            group_ids[vertex.index, j] = group
+            group_weights[vertex.index, j] = weight
+
+    used = group_weights > 0
+    if not used.any():
+        return None
+
+    # The bone map of this mesh only contains the bones actually referenced by its vertices
+    for group in sorted(bone_groups):
+        if group_names[group] not in bone_names:
+            bone_names.append(group_names[group])
+    global_ids = np.array([
+        bone_names.index(name) if group in bone_groups else 0 for group, name in enumerate(group_names)
+    ])[group_ids]
+    bone_map, local_ids = np.unique(np.where(used, global_ids, global_ids[used][0]), return_inverse=True)
+    if len(bone_map) > 128 or bone_map.max() > 255:
+        raise Exception("Mesh {} references too many bones".format(obj.name))
+
+    return tuple(bone_map), local_ids.reshape(-1, 4), group_weights
+
+
+def get_mesh(obj, bone_names):
+    mesh = obj.data
+    mesh.calc_loop_triangles()
+
+    vertex_count = len(mesh.vertices)
+    loop_count = len(mesh.loops)
+
+    positions = np.empty(vertex_count * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", positions)
+    positions = positions.reshape(-1, 3)
+
+    loop_vertices = np.empty(loop_count, dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+
+    corners = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("loops", corners)
+
+    corner_vertices = loop_vertices[corners]
+
+    uv_layers = []
+    for uv_layer in mesh.uv_layers:
+        uv = np.empty(loop_count * 2, dtype=np.float32)
+        uv_layer.data.foreach_get("uv", uv)
+        uv_layers.append(uv.reshape(-1, 2)[corners])
+
+    colors = []
+    for color_attribute in mesh.color_attributes:
+        color = np.empty(len(color_attribute.data) * 4, dtype=np.float32)
+        color_attribute.data.foreach_get("color_srgb", color)
+        color = color.reshape(-1, 4)
+        if color_attribute.domain == "CORNER":
+            colors.append(color[corners])
+        else:
+            colors.append(color[corner_vertices])
+
+    # Split vertices wherever the quantized per corner data differs, like the game does at seams
+    keys = [corner_vertices[:, np.newaxis]]
+    keys += [np.rint(uv * 4096.0) for uv in uv_layers]
+    keys += [np.rint(color * 255.0) for color in colors]
+    keys = np.concatenate(keys, axis=1).astype(np.int64)
+    _, first_corners, faces = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+
+    vertices = corner_vertices[first_corners]
+
+    bone_ids = []
+    bone_weights = []
+    bone_map = ()
+    bone_data = get_bone_data(obj, mesh, bone_names)
+    if bone_data is not None:
+        bone_map, bone_ids, bone_weights = bone_data
+        bone_ids = bone_ids[vertices]
+        bone_weights = bone_weights[vertices]
+
+    return Mesh(
+        get_lod(obj),
+        positions[vertices],
+        faces.reshape(-1, 3),
+        bone_ids,
+        bone_weights,
+        bone_map,
+        [uv[first_corners] for uv in uv_layers],
+        [color[first_corners] for color in colors],
+        get_material(obj)
+    )
+
+
+def export_binmsh(operator, context):
+    objects = context.selected_objects if operator.use_selection else context.scene.objects
+    objects = sorted((obj for obj in objects if obj.type == "MESH"), key=get_export_order)
+
+    if not objects:
+        operator.report({'ERROR'}, "No mesh objects to export")
+        return {'CANCELLED'}
+
+    bone_names = []
+    meshs = [m for obj in objects for m in split_mesh(get_mesh(obj, bone_names))]
+
+    with open(operator.filepath, 'wb') as f:
+        write_binmsh(f, int(operator.version), bone_names, meshs)
+
+    return {'FINISHED'}
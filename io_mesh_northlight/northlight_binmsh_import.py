@@ -18,45 +18,107 @@
 # along with OpenAWE. If not, see <http://www.gnu.org/licenses/>.
 
 import bpy
-import bpy_extras
 
-from .binmsh_loader import BINMSH
+import os.path
 
-from .util import *
-
-class NorthlightImport(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
-    bl_idname = "northlight.binmsh_import"
-    bl_label = "Import Northlight mesh file"
-    bl_description = "Import Northlight mesh file"
-
-    filename_ext = ".binmsh"
+from .binmsh_loader import BINMSH, read_binfol
 
-    filter_glob: bpy.props.StringProperty(default='*.binmsh;*.binfbx', options={"HIDDEN"})
+from .util import *
 
-    def execute(self, context):
-        f = open(self.filepath, 'rb')
+def import_binmsh(operator, context):
+    filepath = os.path.normpath(operator.filepath)
+    f = open(operator.filepath, 'rb')
 
-        binmsh = BINMSH(f)
+    binmsh = BINMSH(f)
 
-        bone_names = binmsh.bone_names
+    bone_names = binmsh.bone_names
 
-        for i, m in zip(range(len(binmsh.meshs)), binmsh.meshs):
-            mesh = bpy.data.meshes.new("mesh{}.lod{}".format(i, m.lod))
-            obj = bpy.data.objects.new("mesh{}.lod{}".format(i, m.lod), mesh)
+    for i, m in zip(range(len(binmsh.meshs)), binmsh.meshs):
+        obj = create_object(
+            "mesh{}.lod{}".format(i, m.lod),
+            m,
+            bone_names,
+            vertex_colors=False,
+            reuse_meshes=operator.reuse_meshes,
+            weld_distance=operator.weld_distance if operator.weld_vertices else 0.0
+        )
+        tag_object(obj, filepath, i, m.lod)
 
-            # Create the meshs basic geometry
-            mesh.from_pydata(m.positions, [], m.faces)
+        link_object(context, obj, filepath, m.lod)
 
-            # Create the uv layers
-            add_uv_layers(mesh, m.faces, m.uv_layers)
+    set_active_lod(context, get_file_collection(context, filepath), operator.active_lod)
 
-            # Create vertex groups for bones
-            add_bone_data(obj, m.bone_map, bone_names, m.bone_ids, m.bone_weights)
+    return {'FINISHED'}
 
-            # Create material for object
-            add_material(obj, m.material)
 
-            bpy.context.scene.collection.objects.link(obj)
+def reimport_binmsh(operator, context):
+    filepath = os.path.normpath(operator.filepath)
+    f = open(operator.filepath, 'rb')
 
-        return {'FINISHED'}
+    vertex_colors = filepath.endswith(".binfol")
+    if vertex_colors:
+        binmsh = read_binfol(f)
+    else:
+        binmsh = BINMSH(f)
 
+    bone_names = binmsh.bone_names
+
+    # Match the existing objects to the submeshs they were created from
+    objects = {}
+    for obj in bpy.data.objects:
+        if obj.get("northlight_file") == filepath:
+            objects.setdefault(obj["northlight_submesh"], []).append(obj)
+
+    # Weld like on import, unless welding was set for this reimport. New submeshs are welded like the others
+    weld_override = None
+    if operator.properties.is_property_set("weld_vertices", ghost=False):
+        weld_override = operator.weld_distance if operator.weld_vertices else 0.0
+
+    file_weld_distance = weld_override
+    if file_weld_distance is None:
+        existing = next(iter(objects.values()), None)
+        file_weld_distance = existing[0].data.get("northlight_weld_distance", 0.0) if existing else 0.0
+
+    updated = 0
+    for i, m in zip(range(len(binmsh.meshs)), binmsh.meshs):
+        if i not in objects:
+            obj = create_object(
+                "mesh{}.lod{}".format(i, m.lod),
+                m,
+                bone_names,
+                vertex_colors=vertex_colors,
+                weld_distance=file_weld_distance
+            )
+            tag_object(obj, filepath, i, m.lod)
+
+            link_object(context, obj, filepath, m.lod)
+            updated += 1
+            continue
+
+        for obj in objects[i]:
+            weld_distance = weld_override
+            if weld_distance is None:
+                weld_distance = obj.data.get("northlight_weld_distance", 0.0)
+
+            changed = update_object(obj, m, bone_names, vertex_colors=vertex_colors, weld_distance=weld_distance)
+
+            if obj.get("northlight_lod") != m.lod:
+                move_object(context, obj, filepath, m.lod)
+                changed = True
+
+            if changed:
+                updated += 1
+
+    # Remove the objects of submeshs no longer in the file
+    for i, removed_objects in objects.items():
+        if i >= len(binmsh.meshs):
+            for obj in removed_objects:
+                bpy.data.objects.remove(obj)
+
+    # Keep the LOD shown before, new LOD collections are excluded like the other ones
+    file_collection = get_file_collection(context, filepath)
+    set_active_lod(context, file_collection, file_collection.get("northlight_active_lod", 0))
+
+    operator.report({'INFO'}, "Updated {} of {} submeshs".format(updated, len(binmsh.meshs)))
+
+    return {'FINISHED'}
@@ -0,0 +1,29 @@
+# OpenAWE - A reimplementation of Remedy's Alan Wake Engine
+#
+# OpenAWE is the legal property of its developers, whose names
+# can be found in the AUTHORS file distributed with this source
+# distribution.
+#
+# OpenAWE is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# OpenAWE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OpenAWE. If not, see <http://www.gnu.org/licenses/>.
+
+from .util import *
+
+
+def set_lod(operator, context):
+    # Visit the layer collection of every file once, instead of searching for it per file
+    for layer_collection in context.view_layer.layer_collection.children:
+        if layer_collection.collection.get("northlight_file") is not None:
+            set_layer_collection_lod(layer_collection, operator.lod)
+
+    return {'FINISHED'}
@@ -0,0 +1,167 @@
+# OpenAWE - A reimplementation of Remedy's Alan Wake Engine
+#
+# OpenAWE is the legal property of its developers, whose names
+# can be found in the AUTHORS file distributed with this source
+# distribution.
+#
+# OpenAWE is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# OpenAWE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OpenAWE. If not, see <http://www.gnu.org/licenses/>.
+
+# Operators registered with the add-on. They only hold the properties, the loader, NumPy and the material modules
+# are imported on the first execute, so enabling the add-on stays cheap.
+
+import bpy
+import bpy_extras
+
+
+def weld_vertices_property(**options):
+    return bpy.props.BoolProperty(
+        name="Weld Vertices",
+        description="Merge the vertices split at uv and normal seams, keeping uvs and colors per face corner",
+        default=False,
+        **options
+    )
+
+
+def weld_distance_property(**options):
+    return bpy.props.FloatProperty(
+        name="Weld Distance",
+        description="Positions closer than this distance are merged",
+        default=1e-5,
+        min=1e-8,
+        precision=6,
+        **options
+    )
+
+
+class WeldOptions:
+    weld_vertices: weld_vertices_property()
+    weld_distance: weld_distance_property()
+
+
+class ReimportWeldOptions:
+    # Not remembered from the last run, so that only changing them for this reimport overrides the weld distance
+    # stored with each mesh
+    weld_vertices: weld_vertices_property(options={'SKIP_SAVE'})
+    weld_distance: weld_distance_property(options={'SKIP_SAVE'})
+
+
+class ImportOptions(WeldOptions):
+    reuse_meshes: bpy.props.BoolProperty(
+        name="Reuse Identical Meshes",
+        description="Link submeshs with identical content to meshes already imported in this session",
+        default=True
+    )
+
+    active_lod: bpy.props.IntProperty(
+        name="Visible LOD",
+        description="LOD left visible, the collections of all other LODs are excluded from the view layer",
+        default=0,
+        min=0
+    )
+
+
+class NorthlightImport(bpy.types.Operator, bpy_extras.io_utils.ImportHelper, ImportOptions):
+    bl_idname = "northlight.binmsh_import"
+    bl_label = "Import Northlight mesh file"
+    bl_description = "Import Northlight mesh file"
+
+    filename_ext = ".binmsh"
+
+    filter_glob: bpy.props.StringProperty(default='*.binmsh;*.binfbx', options={"HIDDEN"})
+
+    def execute(self, context):
+        from . import northlight_binmsh_import
+        return northlight_binmsh_import.import_binmsh(self, context)
+
+
+class NorthlightReimport(bpy.types.Operator, bpy_extras.io_utils.ImportHelper, ReimportWeldOptions):
+    bl_idname = "northlight.binmsh_reimport"
+    bl_label = "Reimport Northlight mesh file"
+    bl_description = (
+        "Update the objects imported from a Northlight mesh file with its current content. "
+        "Meshes keep the weld setting of their import, unless Weld Vertices is changed"
+    )
+
+    filename_ext = ".binmsh"
+
+    filter_glob: bpy.props.StringProperty(default='*.binmsh;*.binfbx;*.binfol', options={"HIDDEN"})
+
+    def execute(self, context):
+        from . import northlight_binmsh_import
+        return northlight_binmsh_import.reimport_binmsh(self, context)
+
+
+class NorthlightFoliageImport(bpy.types.Operator, bpy_extras.io_utils.ImportHelper, ImportOptions):
+    bl_idname = "northlight.binfol_import"
+    bl_label = "Import Northlight foliage mesh file"
+    bl_description = "Import Northlight foliage mesh file"
+
+    filename_ext = ".binfol"
+
+    filter_glob: bpy.props.StringProperty(default='*.binfol', options={"HIDDEN"})
+
+    def execute(self, context):
+        from . import northlight_binfol_import
+        return northlight_binfol_import.import_binfol(self, context)
+
+
+class NorthlightExport(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
+    bl_idname = "northlight.binmsh_export"
+    bl_label = "Export Northlight mesh file"
+    bl_description = "Export Northlight mesh file"
+
+    filename_ext = ".binmsh"
+
+    filter_glob: bpy.props.StringProperty(default='*.binmsh', options={"HIDDEN"})
+
+    version: bpy.props.EnumProperty(
+        name="Version",
+        items=[
+            ("19", "Alan Wake", "Alan Wake Mesh"),
+            ("20", "Alan Wakes American Nightmare (20)", "Alan Wakes American Nightmare Mesh"),
+            ("21", "Alan Wakes American Nightmare (21)", "Alan Wakes American Nightmare Mesh"),
+        ],
+        default="19"
+    )
+
+    use_selection: bpy.props.BoolProperty(name="Selected Only", default=True)
+
+    def execute(self, context):
+        from . import northlight_binmsh_export
+        return northlight_binmsh_export.export_binmsh(self, context)
+
+
+class NorthlightSetLOD(bpy.types.Operator):
+    bl_idname = "northlight.set_lod"
+    bl_label = "Set Northlight LOD"
+    bl_description = "Show one LOD of all imported Northlight meshes and exclude the others from the view layer"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    lod: bpy.props.IntProperty(name="LOD", default=0, min=0)
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        from . import northlight_lod
+        return northlight_lod.set_lod(self, context)
+
+
+classes = [
+    NorthlightImport,
+    NorthlightReimport,
+    NorthlightFoliageImport,
+    NorthlightExport,
+    NorthlightSetLOD
+]
@@ -18,49 +18,129 @@
 # along with OpenAWE. If not, see <http://www.gnu.org/licenses/>.
 
 import bpy
+import numpy as np
+
+import re
+import json
+import os.path
 
 from .material import GlobalFlags
 from .material import standardmaterial
 
+
+# Mesh datablocks built in this session by the content hash of their submesh, used to share identical geometry
+mesh_registry = {}
+
+
+def get_geometry_key(m, vertex_colors, weld_distance=0.0):
+    key = m.content_hash + ".colors" if vertex_colors else m.content_hash
+    return key + ".weld{}".format(weld_distance) if weld_distance > 0 else key
+
+
+def get_mesh_key(m, vertex_colors, weld_distance=0.0):
+    return get_geometry_key(m, vertex_colors, weld_distance) + m.material.content_hash
+
+
+def find_mesh(key):
+    name = mesh_registry.get(key)
+    mesh = bpy.data.meshes.get(name) if name is not None else None
+
+    # The datablock might have been removed or renamed since it was registered
+    if mesh is None or mesh.get("northlight_hash") != key:
+        return None
+
+    return mesh
+
+
+def weld_vertices(positions, faces, distance):
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+    if len(positions) == 0:
+        return positions, faces, np.arange(len(faces)), np.arange(0)
+
+    # Vertices split at uv and normal seams share their position, so merge them by their quantized position
+    quantized = np.rint(positions / distance).astype(np.int64)
+    _, first, remap = np.unique(quantized, axis=0, return_index=True, return_inverse=True)
+    welded_faces = remap.reshape(-1)[faces]
+
+    # Drop the triangles collapsing into a line or point through welding
+    kept = np.flatnonzero(
+        (welded_faces[:, 0] != welded_faces[:, 1]) &
+        (welded_faces[:, 1] != welded_faces[:, 2]) &
+        (welded_faces[:, 2] != welded_faces[:, 0])
+    )
+
+    # The front and back of double sided geometry end up on the same vertices, which Blender considers invalid.
+    # Keep only the first triangle of every vertex triple
+    _, unique = np.unique(np.sort(welded_faces[kept], axis=1), axis=0, return_index=True)
+    kept = kept[np.sort(unique)]
+
+    return positions[first], welded_faces[kept], kept, first
+
+
+def set_geometry(mesh, positions, faces):
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+    faces = np.asarray(faces, dtype=np.int32).reshape(-1, 3)
+
+    mesh.vertices.add(len(positions))
+    mesh.loops.add(len(faces) * 3)
+    mesh.polygons.add(len(faces))
+
+    mesh.vertices.foreach_set("co", positions.ravel())
+    mesh.loops.foreach_set("vertex_index", faces.ravel())
+    mesh.polygons.foreach_set("loop_start", np.arange(0, len(faces) * 3, 3, dtype=np.int32))
+
+    mesh.update(calc_edges=True)
+
+
 def add_uv_layers(mesh, faces, uv_layers):
+    loop_vertices = np.asarray(faces, dtype=np.int64).ravel()
+
     # Create the uv layers
     for uv in uv_layers:
         uv_layer = mesh.uv_layers.new()
-        for j in range(len(faces)):
-            indices = faces[j]
-            uv_layer.data[j * 3].uv = uv[indices[0]]
-            uv_layer.data[j * 3 + 1].uv = uv[indices[1]]
-            uv_layer.data[j * 3 + 2].uv = uv[indices[2]]
+        uv_layer.data.foreach_set("uv", np.asarray(uv, dtype=np.float32).reshape(-1, 2)[loop_vertices].ravel())
 
 
 def add_vertex_colors(mesh, faces, colors):
+    loop_vertices = np.asarray(faces, dtype=np.int64).ravel()
+
     # Create the vertex color
     for color in colors:
         vertex_color = mesh.vertex_colors.new()
-        for j in range(len(faces)):
-            indices = faces[j]
-            vertex_color.data[j * 3].color = color[indices[0]]
-            vertex_color.data[j * 3 + 1].color = color[indices[1]]
-            vertex_color.data[j * 3 + 2].color = color[indices[2]]
+        vertex_color.data.foreach_set("color", np.asarray(color, dtype=np.float32).reshape(-1, 4)[loop_vertices].ravel())
 
 
 def add_bone_data(obj, bone_map, bone_names, bone_ids, bone_weights):
-    # Create vertex groups for bones
-    for bone_index in bone_map:
-        obj.vertex_groups.new(name=bone_names[bone_index])
+    if len(bone_ids) == 0:
+        return
 
-    # Create the vertex groups with weight for skinning
-    for vertex_index, vertex_bone_indices, vertex_bone_weights in zip(range(len(bone_ids)), bone_ids, bone_weights):
-        for vertex_bone_index, vertex_bone_weight in zip(vertex_bone_indices, vertex_bone_weights):
+    # Gather all influences with weight in one pass, so only the bones used by this mesh get a vertex group
+    bone_weights = np.asarray(bone_weights)
+    vertex_indices, influence_indices = np.nonzero(bone_weights != 0)
+    bones = np.asarray(bone_map, dtype=np.int64)[np.asarray(bone_ids)[vertex_indices, influence_indices]]
+    weights = bone_weights[vertex_indices, influence_indices]
 
-            if vertex_bone_weight == 0:
-                continue
+    # A vertex listing the same bone twice is deformed by the sum of both weights, so add them up
+    pairs, inverse = np.unique(np.column_stack((bones, vertex_indices)), axis=0, return_inverse=True)
+    bones, vertex_indices = pairs[:, 0], pairs[:, 1]
+    summed = np.zeros(len(pairs))
+    np.add.at(summed, inverse.reshape(-1), weights)
+    weights = summed
 
-            obj.vertex_groups[bone_names[bone_map[vertex_bone_index]]].add(
-                [vertex_index],
-                vertex_bone_weight,
-                "REPLACE"
-            )
+    # Sort the influences by bone and weight, so that every run of equal weights is added at once
+    order = np.lexsort((weights, bones))
+    vertex_indices, bones, weights = vertex_indices[order], bones[order], weights[order]
+    starts = np.flatnonzero((np.diff(bones, prepend=-1) != 0) | (np.diff(weights, prepend=-1.0) != 0))
+    ends = np.append(starts[1:], len(bones))
+
+    # Create the vertex groups with weight for skinning
+    vertex_group = None
+    for start, end in zip(starts, ends):
+        if start == 0 or bones[start] != bones[start - 1]:
+            vertex_group = obj.vertex_groups.new(name=bone_names[bones[start]])
+
+        vertex_group.add(vertex_indices[start:end].tolist(), float(weights[start]), "REPLACE")
 
 
 def add_material(obj, material):
@@ -75,10 +155,205 @@ def add_material(obj, material):
             )
 
     if material is not None:
+        tag_material(material, mesh_material)
         obj.data.materials.append(material)
 
+    add_armature_modifier(obj, mesh_material)
+
+
+def tag_material(material, mesh_material):
+    # Keep the whole material record, since the node tree only shows part of it and Blender renames duplicate
+    # datablocks, so the exporter can write it back unchanged
+    material["northlight_material"] = json.dumps({
+        "type": mesh_material.type,
+        "name": mesh_material.name,
+        "properties": mesh_material.properties,
+        "blend_mode": mesh_material.blend_mode,
+        "cull_mode": mesh_material.cull_mode,
+        "flags": mesh_material.flags,
+        "uniforms": mesh_material.uniforms,
+        "uniform_types": mesh_material.uniform_types,
+    })
+
+
+def add_armature_modifier(obj, material):
     # If the flag for skinning is set, add an armature modifier
-    if mesh_material.properties & GlobalFlags.SKINNING_MATRICES:
+    if material.properties & GlobalFlags.SKINNING_MATRICES:
         armature_modifier = obj.modifiers.new("skin", "ARMATURE")
         armature_modifier.use_bone_envelopes = False
         armature_modifier.use_vertex_groups = True
+
+
+def get_file_collection(context, filepath):
+    for collection in context.scene.collection.children:
+        if collection.get("northlight_file") == filepath:
+            return collection
+
+    collection = bpy.data.collections.new(os.path.basename(filepath))
+    collection["northlight_file"] = filepath
+    context.scene.collection.children.link(collection)
+    return collection
+
+
+def get_lod_collection(file_collection, lod):
+    for collection in file_collection.children:
+        if collection.get("northlight_lod") == lod:
+            return collection
+
+    collection = bpy.data.collections.new("{}.lod{}".format(file_collection.name, lod))
+    collection["northlight_lod"] = lod
+    file_collection.children.link(collection)
+    return collection
+
+
+def link_object(context, obj, filepath, lod):
+    get_lod_collection(get_file_collection(context, filepath), lod).objects.link(obj)
+
+
+def move_object(context, obj, filepath, lod):
+    # Moves the object of a submesh whose LOD changed into the collection and under the name of its new LOD
+    lod_collection = get_lod_collection(get_file_collection(context, filepath), lod)
+    for collection in obj.users_collection:
+        if collection.get("northlight_lod") is not None and collection != lod_collection:
+            collection.objects.unlink(obj)
+
+    if obj.name not in lod_collection.objects:
+        lod_collection.objects.link(obj)
+
+    obj.name = re.sub(r"\.lod\d+", ".lod{}".format(lod), obj.name)
+    obj["northlight_lod"] = lod
+
+    # A mesh shared with other objects keeps its name
+    if obj.data.users == 1:
+        obj.data.name = re.sub(r"\.lod\d+", ".lod{}".format(lod), obj.data.name)
+
+
+def set_active_lod(context, file_collection, lod):
+    # File collections are children of the scene collection, so their layer collection is a child of the root
+    file_layer_collection = context.view_layer.layer_collection.children.get(file_collection.name)
+    if file_layer_collection is not None:
+        set_layer_collection_lod(file_layer_collection, lod)
+
+
+def set_layer_collection_lod(file_layer_collection, lod):
+    file_layer_collection.collection["northlight_active_lod"] = lod
+
+    lod_layer_collections = [
+        c for c in file_layer_collection.children if c.collection.get("northlight_lod") is not None
+    ]
+    if not lod_layer_collections:
+        return
+
+    # Fall back to the coarsest LOD for files having fewer LODs, and exclude all others from the view layer so the
+    # depsgraph does not evaluate them at all
+    lod = min(lod, max(c.collection["northlight_lod"] for c in lod_layer_collections))
+    for layer_collection in lod_layer_collections:
+        layer_collection.exclude = layer_collection.collection["northlight_lod"] != lod
+
+
+def tag_object(obj, filepath, index, lod):
+    # Identifies the submesh an object was created from for reimporting
+    obj["northlight_file"] = filepath
+    obj["northlight_submesh"] = index
+    obj["northlight_lod"] = lod
+
+
+def tag_mesh(obj, m, vertex_colors, weld_distance=0.0):
+    key = get_mesh_key(m, vertex_colors, weld_distance)
+    mesh = obj.data
+
+    mesh["northlight_hash"] = key
+    mesh["northlight_geometry_hash"] = get_geometry_key(m, vertex_colors, weld_distance)
+    mesh["northlight_material_hash"] = m.material.content_hash
+    mesh["northlight_weld_distance"] = weld_distance
+
+    # The vertex groups are stored on the object, so keep their order with the mesh for objects sharing it
+    if len(obj.vertex_groups) > 0:
+        mesh["northlight_vertex_groups"] = [group.name for group in obj.vertex_groups]
+    elif "northlight_vertex_groups" in mesh:
+        del mesh["northlight_vertex_groups"]
+
+    mesh_registry[key] = mesh.name
+
+
+def build_geometry(obj, m, bone_names, vertex_colors, weld_distance=0.0):
+    mesh = obj.data
+
+    positions = m.positions
+    faces = m.faces
+    loop_faces = m.faces
+    bone_ids = m.bone_ids
+    bone_weights = m.bone_weights
+
+    if weld_distance > 0:
+        positions, faces, kept, first = weld_vertices(m.positions, m.faces, weld_distance)
+
+        # The loop data still uses the unwelded vertices, so uvs and colors keep their seams
+        loop_faces = np.asarray(m.faces, dtype=np.int64).reshape(-1, 3)[kept]
+        if len(bone_ids) > 0:
+            bone_ids = np.asarray(bone_ids)[first]
+            bone_weights = np.asarray(bone_weights)[first]
+
+    # Create the meshs basic geometry
+    set_geometry(mesh, positions, faces)
+
+    # Create the uv layers
+    add_uv_layers(mesh, loop_faces, m.uv_layers)
+
+    # Create the color layers
+    if vertex_colors:
+        add_vertex_colors(mesh, loop_faces, m.vertex_colors)
+
+    # Create vertex groups for bones
+    add_bone_data(obj, m.bone_map, bone_names, bone_ids, bone_weights)
+
+
+def create_object(name, m, bone_names, vertex_colors=False, reuse_meshes=True, weld_distance=0.0):
+    # Link identical geometry to the already built mesh and only recreate the per object data
+    mesh = find_mesh(get_mesh_key(m, vertex_colors, weld_distance)) if reuse_meshes else None
+    if mesh is not None:
+        obj = bpy.data.objects.new(name, mesh)
+        for group_name in mesh.get("northlight_vertex_groups", ()):
+            obj.vertex_groups.new(name=group_name)
+        add_armature_modifier(obj, m.material)
+        return obj
+
+    mesh = bpy.data.meshes.new(name)
+    obj = bpy.data.objects.new(name, mesh)
+
+    build_geometry(obj, m, bone_names, vertex_colors, weld_distance)
+
+    # Create material for object
+    add_material(obj, m.material)
+
+    tag_mesh(obj, m, vertex_colors, weld_distance)
+
+    return obj
+
+
+def update_object(obj, m, bone_names, vertex_colors=False, weld_distance=0.0):
+    mesh = obj.data
+    if mesh.get("northlight_hash") == get_mesh_key(m, vertex_colors, weld_distance):
+        return False
+
+    # Give the object its own mesh instead of changing all objects sharing it
+    if mesh.users > 1:
+        mesh = mesh.copy()
+        obj.data = mesh
+
+    # Write the new arrays into the existing mesh, keeping the datablock and all references to it
+    if mesh.get("northlight_geometry_hash") != get_geometry_key(m, vertex_colors, weld_distance):
+        mesh.clear_geometry()
+        obj.vertex_groups.clear()
+        build_geometry(obj, m, bone_names, vertex_colors, weld_distance)
+
+    if mesh.get("northlight_material_hash") != m.material.content_hash:
+        mesh.materials.clear()
+        armature_modifier = obj.modifiers.get("skin")
+        if armature_modifier is not None:
+            obj.modifiers.remove(armature_modifier)
+        add_material(obj, m.material)
+
+    tag_mesh(obj, m, vertex_colors, weld_distance)
+
+    return True
@@ -0,0 +1,170 @@
+# OpenAWE - A reimplementation of Remedy's Alan Wake Engine
+#
+# OpenAWE is the legal property of its developers, whose names
+# can be found in the AUTHORS file distributed with this source
+# distribution.
+#
+# OpenAWE is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# OpenAWE is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with OpenAWE. If not, see <http://www.gnu.org/licenses/>.
+
+# Writes meshes with the exporter's writer and reads them back with the loader, which must reproduce the same data
+
+import io
+import os
+import sys
+import dataclasses
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from io_mesh_northlight.binmsh_loader import BINMSH, Material, Mesh
+from io_mesh_northlight.binmsh_writer import split_mesh, write_binmsh
+
+
+def create_mesh(rng, lod, vertex_count, triangle_count, vertex_colors):
+    # All quantized attributes lie exactly on their quantization steps, so they survive the round trip unchanged
+    material = Material(
+        "standardmaterial",
+        "material.lod{}".format(lod),
+        0x40000000 | 0x80000000 | 0x4,
+        {
+            "g_sColorMap": "textures/a_rather_long_directory_name/and_a_rather_long_texture_name_color.dds",
+            "g_vColorMultiplier": (1.0, 0.5, 0.25, 1.0),
+            "g_sSpecularMap": "textures/specular.dds",
+            "g_vSpecularMultiplier": (0.5, 0.5, 0.5),
+            "g_fGlossiness": (0.25,),
+            "g_sAlphaTestSampler": "textures/alpha.dds",
+            "g_sDetailMap": "textures/detail.dds",
+            "g_bTwoSided": True,
+            "g_tSampler": None,
+        },
+        blend_mode=1,
+        cull_mode=2,
+        flags=3,
+        uniform_types={
+            "g_sColorMap": 7,
+            "g_vColorMultiplier": 3,
+            "g_sSpecularMap": 7,
+            "g_vSpecularMultiplier": 2,
+            "g_fGlossiness": 0,
+            "g_sAlphaTestSampler": 7,
+            "g_sDetailMap": 9,
+            "g_bTwoSided": 12,
+            "g_tSampler": 8,
+        }
+    )
+
+    return Mesh(
+        lod,
+        rng.uniform(-10.0, 10.0, (vertex_count, 3)).astype(np.float32),
+        rng.integers(0, vertex_count, (triangle_count, 3)),
+        rng.integers(0, 16, (vertex_count, 4)),
+        rng.integers(0, 256, (vertex_count, 4)) / 255.0,
+        tuple(range(lod * 4, lod * 4 + 16)),
+        [rng.integers(0, 4097, (vertex_count, 2)) / 4096.0 for _ in range(2)],
+        [rng.integers(0, 256, (vertex_count, 4)) / 255.0] if vertex_colors else [],
+        material
+    )
+
+
+def write_and_read(version, bone_names, meshs):
+    f = io.BytesIO()
+    write_binmsh(f, version, bone_names, meshs)
+    f.seek(0)
+    return BINMSH(f)
+
+
+@pytest.mark.parametrize("version", [19, 20, 21])
+@pytest.mark.parametrize("vertex_colors", [False, True])
+def test_round_trip(version, vertex_colors):
+    rng = np.random.default_rng(version)
+    bone_names = ["bone{}".format(i) for i in range(32)]
+    meshs = [create_mesh(rng, lod, 100 + lod, 150, vertex_colors) for lod in (0, 1, 2, 0)]
+
+    binmsh = write_and_read(version, bone_names, meshs)
+
+    assert binmsh.bone_names == bone_names
+    assert len(binmsh.meshs) == len(meshs)
+    for expected, m in zip(meshs, binmsh.meshs):
+        assert m.lod == expected.lod
+        np.testing.assert_array_equal(np.reshape(m.positions, (-1, 3)), expected.positions)
+        np.testing.assert_array_equal(np.reshape(m.faces, (-1, 3)), expected.faces)
+        np.testing.assert_array_equal(np.reshape(m.bone_ids, (-1, 4)), expected.bone_ids)
+        np.testing.assert_allclose(np.reshape(m.bone_weights, (-1, 4)), expected.bone_weights, atol=1e-6)
+        assert tuple(m.bone_map) == expected.bone_map
+
+        assert len(m.uv_layers) == len(expected.uv_layers)
+        for uv, expected_uv in zip(m.uv_layers, expected.uv_layers):
+            np.testing.assert_allclose(np.reshape(uv, (-1, 2)), expected_uv, atol=1e-6)
+
+        assert len(m.vertex_colors) == len(expected.vertex_colors)
+        for color, expected_color in zip(m.vertex_colors, expected.vertex_colors):
+            np.testing.assert_allclose(np.reshape(color, (-1, 4)), expected_color, atol=1e-6)
+
+        # Material names are only stored from version 20 on
+        material = dataclasses.replace(m.material, content_hash="")
+        expected_material = expected.material if version >= 20 else dataclasses.replace(expected.material, name="")
+        assert material == expected_material
+
+
+def test_identical_submeshs_share_hash():
+    rng = np.random.default_rng(0)
+    m = create_mesh(rng, 0, 50, 60, False)
+
+    binmsh = write_and_read(20, ["bone{}".format(i) for i in range(16)], [m, m])
+
+    assert binmsh.meshs[0].content_hash == binmsh.meshs[1].content_hash
+    assert binmsh.meshs[0].material.content_hash == binmsh.meshs[1].material.content_hash
+
+
+@pytest.mark.parametrize("uv", [(0.5, 1.5), (16.0, 0.5), (-0.25, 0.5)])
+def test_uvs_out_of_range(uv):
+    rng = np.random.default_rng(0)
+    m = create_mesh(rng, 0, 10, 10, False)
+    m.uv_layers[0][3] = uv
+
+    with pytest.raises(Exception, match="UV coordinates"):
+        write_binmsh(io.BytesIO(), 20, ["bone{}".format(i) for i in range(16)], [m])
+
+
+def test_split_large_mesh():
+    # A grid with more vertices than 16 bit indices can address
+    rng = np.random.default_rng(0)
+    size = 260
+    x, y = np.meshgrid(np.arange(size), np.arange(size), indexing="ij")
+    quads = (x[:-1, :-1] * size + y[:-1, :-1]).reshape(-1)
+    faces = np.concatenate((
+        np.column_stack((quads, quads + size, quads + 1)),
+        np.column_stack((quads + 1, quads + size, quads + size + 1)),
+    ))
+    m = create_mesh(rng, 1, size * size, 1, True)
+    m.faces = faces
+
+    meshs = split_mesh(m)
+    binmsh = write_and_read(20, ["bone{}".format(i) for i in range(32)], meshs)
+
+    assert len(binmsh.meshs) > 1
+    assert all(len(sub.positions) <= 0x10000 for sub in binmsh.meshs)
+    assert all(sub.lod == m.lod and sub.material.name == m.material.name for sub in binmsh.meshs)
+
+    # Every triangle keeps its corners and their attributes, in the original order
+    def get_corners(get_attribute, count):
+        return np.concatenate([
+            np.reshape(get_attribute(sub), (-1, count))[np.reshape(sub.faces, (-1, 3))] for sub in binmsh.meshs
+        ])
+
+    np.testing.assert_array_equal(get_corners(lambda sub: sub.positions, 3), m.positions[faces])
+    np.testing.assert_allclose(get_corners(lambda sub: sub.uv_layers[0], 2), m.uv_layers[0][faces], atol=1e-6)
+    np.testing.assert_allclose(get_corners(lambda sub: sub.bone_weights, 4), m.bone_weights[faces], atol=1e-6)